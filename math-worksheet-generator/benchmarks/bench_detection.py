@@ -0,0 +1,96 @@
+"""
+Detection benchmark: cost of the section sweep per enabled heading style.
+
+Lays out a synthetic mixed-style textbook once, then times only the
+section sweep over those layouts: with the default profile, with all
+built-in profiles through the combined matcher, and with all profiles
+swept one after another (what separate matchers per format would cost).
+Line matching is reported on its own, since question counting naturally
+grows with the number of sections found.  Exits non-zero if enabling
+every profile makes line matching more than ``--max-ratio`` times slower
+than with the default one, or if a section is missed.
+
+    python3 benchmarks/bench_detection.py [--pages 400] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from detection import BUILTIN_PROFILES
+from pdf_generator import PDFGenerator, _layout_pages
+from source_document import SourceDocument
+from timing import PhaseTimings
+from fixtures import make_textbook_pdf
+
+
+def sweep_time(generator, layouts, repeat):
+    """Best-of-``repeat`` seconds of one sweep and of its line matching, and the sections."""
+    best = best_match = None
+    for _ in range(max(1, repeat)):
+        timings = PhaseTimings()
+        t0 = time.perf_counter()
+        sections = []
+        open_sec = None
+        for _, _, closed, open_sec in generator._sweep(enumerate(layouts), timings):
+            sections.extend(closed)
+        if open_sec is not None:
+            sections.append(generator._finish_section(open_sec))
+        elapsed = time.perf_counter() - t0
+        match = timings.totals['match_lines'][0]
+        best = elapsed if best is None else min(best, elapsed)
+        best_match = match if best_match is None else min(best_match, match)
+    return best, best_match, sections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--sections', type=int, default=30)
+    parser.add_argument('--questions', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ratio', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        src = make_textbook_pdf(os.path.join(workdir, 'mixed.pdf'), args.pages,
+                                args.sections, args.questions, style='mixed')
+        with SourceDocument(src) as document:
+            layouts = list(_layout_pages(document, 0, None, PDFGenerator.X_TOLERANCE,
+                                         PDFGenerator.Y_TOLERANCE))
+
+    names = list(BUILTIN_PROFILES)
+    default = sweep_time(PDFGenerator(), layouts, args.repeat)
+    combined = sweep_time(PDFGenerator(profiles=names), layouts, args.repeat)
+    separate = [sweep_time(PDFGenerator(profiles=[name]), layouts, args.repeat)
+                for name in names]
+    combined_secs = combined[2]
+
+    lines = sum(len(lines) for _, lines in layouts if lines is not None)
+    print(f"{len(layouts)} pages, {lines} lines, {len(names)} built-in profiles")
+    print(f"{'sweep':<28} {'total ms':>9} {'match ms':>9} {'sections':>9}")
+    for label, (total_s, match_s, sections) in (
+            ('default profile', default),
+            ('all profiles, combined', combined),
+            ('all profiles, one by one', (sum(r[0] for r in separate),
+                                          sum(r[1] for r in separate),
+                                          [s for r in separate for s in r[2]]))):
+        print(f"{label:<28} {total_s * 1000:>9.1f} {match_s * 1000:>9.1f} {len(sections):>9}")
+
+    failed = False
+    ratio = combined[1] / default[1] if default[1] else 0
+    if ratio > args.max_ratio:
+        print(f"REGRESSION line matching {ratio:.2f}x the default (max {args.max_ratio}x)")
+        failed = True
+    expected = min(args.sections, args.pages - 1)
+    if len(combined_secs) != expected:
+        print(f"MISSED sections: found {len(combined_secs)} of {expected}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Start-up benchmark: how long importing each entry point takes.
+
+Every module is imported in a fresh interpreter (best of ``--repeat``)
+and the script checks which heavy libraries that import dragged in.
+pdfplumber / pdfminer and PyPDF2 are only needed once a PDF is scanned
+or rendered, and Qt only by the GUI, so the exit status is non-zero if
+an entry point loads one of them up front, or (with ``--max-ms``) if an
+import takes longer than that.  The cost moved to the first extraction
+is shown on the last line for reference.
+
+    python3 benchmarks/bench_import.py [--repeat 5] [--max-ms 150]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, '..', 'src')
+
+PDF_LIBS = ('pdfplumber', 'pdfminer', 'PyPDF2')
+
+CASES = [
+    # module, libraries it must not load, needs Qt
+    ('pdf_generator', PDF_LIBS + ('PyQt5',), False),
+    ('cli', PDF_LIBS + ('PyQt5',), False),
+    ('service', PDF_LIBS + ('PyQt5',), False),
+    ('watcher', PDF_LIBS + ('PyQt5',), False),
+    ('gui.main_window', PDF_LIBS, True),
+]
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{'seconds': elapsed,
+                  'loaded': [m for m in {watch!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(imports, watch, repeat):
+    """Best-of-``repeat`` seconds of ``imports`` in a fresh interpreter, and what it loaded."""
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    best = None
+    loaded = []
+    for _ in range(max(1, repeat)):
+        code = PROBE.format(imports=imports, watch=tuple(watch))
+        out = subprocess.run([sys.executable, '-c', code], cwd=SRC, env=env,
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1])
+        result = json.loads(out.stdout)
+        best = result['seconds'] if best is None else min(best, result['seconds'])
+        loaded = result['loaded']
+    return best, loaded
+
+
+def has_qt():
+    out = subprocess.run([sys.executable, '-c', 'import PyQt5.QtWidgets'],
+                         capture_output=True)
+    return out.returncode == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="fail if any entry point takes longer to import")
+    args = parser.parse_args(argv)
+
+    qt = has_qt()
+    problems = []
+    print(f"{'import':<28} {'ms':>8}  heavy modules loaded")
+    for module, forbidden, needs_qt in CASES:
+        if needs_qt and not qt:
+            print(f"{module:<28} {'-':>8}  (skipped, PyQt5 not installed)")
+            continue
+        seconds, loaded = time_import(f"import {module}", forbidden, args.repeat)
+        print(f"{module:<28} {seconds * 1000:>8.1f}  {', '.join(loaded) or '-'}")
+        if loaded:
+            problems.append(f"{module} loads {', '.join(loaded)} at import")
+        if args.max_ms is not None and seconds * 1000 > args.max_ms:
+            problems.append(f"{module} imports in {seconds * 1000:.0f} ms "
+                            f"(max {args.max_ms:g} ms)")
+
+    seconds, _ = time_import("import pdfplumber, PyPDF2", (), args.repeat)
+    print(f"{'first scan: PDF libraries':<28} {seconds * 1000:>8.1f}")
+
+    for msg in problems:
+        print(f"REGRESSION {msg}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
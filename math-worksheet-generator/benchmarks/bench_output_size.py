@@ -0,0 +1,90 @@
+"""
+Regression benchmark: worksheet output size.
+
+Generates worksheets from synthetic fixtures with the plain and the
+optimised write path, prints the size before and after, and compares the
+optimised size with ``baseline_output_size.json``.  Exits non-zero if any
+case grew by more than ``--tolerance`` (default 2%).
+
+    python3 benchmarks/bench_output_size.py [--update-baseline]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from pdf_generator import PDFGenerator
+from fixtures import make_textbook_pdf
+
+BASELINE_PATH = os.path.join(HERE, 'baseline_output_size.json')
+
+CASES = [
+    # name, pages, sections, questions per section
+    ('small', 10, 3, 6),
+    ('chapter', 60, 6, 40),
+    ('textbook', 200, 20, 20),
+]
+
+
+def measure(workdir):
+    results = {}
+    for name, pages, sections, questions in CASES:
+        src = make_textbook_pdf(os.path.join(workdir, f"{name}.pdf"), pages, sections, questions)
+        gen = PDFGenerator()
+        gen.extract_questions_from_pdf(src)
+
+        out = os.path.join(workdir, f"{name}_worksheet.pdf")
+        gen.generate_worksheet_pdf(out, optimize=False)
+        plain = gen.last_write_report['bytes']
+        gen.generate_worksheet_pdf(out)
+        report = gen.last_write_report
+
+        results[name] = {
+            'plain_bytes': plain,
+            'optimized_bytes': report['bytes'],
+            'streams_compressed': report['streams_compressed'],
+            'objects_deduplicated': report['objects_deduplicated'],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = measure(workdir)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    failed = False
+    print(f"{'case':<10} {'before':>10} {'after':>10} {'ratio':>7} {'baseline':>10}")
+    for name, r in results.items():
+        base = baseline.get(name, {}).get('optimized_bytes')
+        status = ''
+        if base is not None and r['optimized_bytes'] > base * (1 + args.tolerance):
+            status = '  REGRESSION'
+            failed = True
+        print(f"{name:<10} {r['plain_bytes']:>10} {r['optimized_bytes']:>10} "
+              f"{r['plain_bytes'] / r['optimized_bytes']:>6.2f}x {base if base else '-':>10}{status}")
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Regression benchmark: extraction and generation on synthetic textbooks.
+
+Builds textbook PDFs of 10 to 2,000 pages (see ``fixtures.py``), then
+times ``extract_questions_from_pdf`` and ``generate_worksheet_pdf``
+separately (best of ``--repeat`` runs), measures their peak Python memory
+with ``tracemalloc`` in a separate pass, and records the worksheet size.
+Results are compared with ``baseline_pipeline.json``; the exit status is
+non-zero if any case got slower, bigger or hungrier than the tolerances
+allow.  Timings are machine-specific, so refresh the baseline with
+``--update-baseline`` when switching machines.
+
+    python3 benchmarks/bench_pipeline.py [--max-pages 500] [--update-baseline]
+    python3 benchmarks/bench_pipeline.py --pages 800 --sections 40 --questions 25
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from pdf_generator import PDFGenerator
+from fixtures import make_textbook_pdf
+
+BASELINE_PATH = os.path.join(HERE, 'baseline_pipeline.json')
+
+CASES = [
+    # name, pages, sections, questions per section
+    ('10p', 10, 3, 6),
+    ('100p', 100, 10, 20),
+    ('500p', 500, 40, 30),
+    ('2000p', 2000, 120, 40),
+]
+
+# metric -> (tolerance option, label)
+CHECKS = [
+    ('extract_s', 'time_tolerance', 'extract'),
+    ('generate_s', 'time_tolerance', 'generate'),
+    ('extract_peak_kb', 'memory_tolerance', 'extract memory'),
+    ('generate_peak_kb', 'memory_tolerance', 'generate memory'),
+    ('output_bytes', 'size_tolerance', 'output size'),
+]
+
+
+def run_once(src, out, workers):
+    """Extract and generate once; returns (extract_s, generate_s, generator)."""
+    gen = PDFGenerator(workers=workers)
+    t0 = time.perf_counter()
+    gen.extract_questions_from_pdf(src)
+    t1 = time.perf_counter()
+    gen.generate_worksheet_pdf(out)
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1, gen
+
+
+def peak_memory(src, out, workers):
+    """
+    Peak traced memory (KiB) of extraction and of generation.
+
+    The generate figure is its peak minus what was already traced when it
+    started: the scan's open SourceDocument (parsed objects shared with the
+    render) is extraction memory, not something generation allocated.
+    """
+    gen = PDFGenerator(workers=workers)
+    tracemalloc.start()
+    try:
+        gen.extract_questions_from_pdf(src)
+        extract_peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()   # do not charge extraction garbage to generation
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        gen.generate_worksheet_pdf(out)
+        generate_peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return extract_peak // 1024, generate_peak // 1024
+
+
+def warm_up(workdir, workers):
+    """
+    One untimed extract + generate, so the PDF libraries (imported on first
+    use) are not charged to the first case's timings and memory.
+    """
+    src = make_textbook_pdf(os.path.join(workdir, "warmup.pdf"), 2, 1, 2)
+    gen = run_once(src, os.path.join(workdir, "warmup_worksheet.pdf"), workers)[2]
+    gen.close()
+
+
+def measure(cases, workdir, repeat=1, workers=1, memory=True):
+    results = {}
+    warm_up(workdir, workers)
+    for name, pages, sections, questions in cases:
+        src = make_textbook_pdf(os.path.join(workdir, f"{name}.pdf"), pages, sections, questions)
+        out = os.path.join(workdir, f"{name}_worksheet.pdf")
+
+        runs = [run_once(src, out, workers) for _ in range(max(1, repeat))]
+        gen = runs[-1][2]
+        r = {
+            'pages': pages,
+            'sections': len(gen.sections),
+            'questions': sum(sec['question_count'] for sec in gen.sections),
+            'extract_s': round(min(run[0] for run in runs), 4),
+            'generate_s': round(min(run[1] for run in runs), 4),
+            'output_bytes': gen.last_write_report['bytes'],
+        }
+        if memory:
+            r['extract_peak_kb'], r['generate_peak_kb'] = peak_memory(src, out, workers)
+        results[name] = r
+        print(f"  {name}: done", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, args):
+    """Return a list of regression messages."""
+    problems = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, tol_name, label in CHECKS:
+            if metric not in r or metric not in base:
+                continue
+            limit = base[metric] * (1 + getattr(args, tol_name))
+            if r[metric] > limit:
+                problems.append(f"{name}: {label} {r[metric]} > {base[metric]} "
+                                f"(+{getattr(args, tol_name):.0%} allowed)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help="skip built-in cases larger than this")
+    parser.add_argument('--pages', type=int, help="run a single custom case of this size")
+    parser.add_argument('--sections', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=20,
+                        help="questions per section in the custom case")
+    parser.add_argument('--repeat', type=int, default=1, help="keep the best of N timings")
+    parser.add_argument('--workers', type=int, default=1, help="PDFGenerator workers")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.20)
+    parser.add_argument('--size-tolerance', type=float, default=0.02)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.pages:
+        cases = [(f"custom{args.pages}p", args.pages, args.sections, args.questions)]
+    else:
+        cases = [c for c in CASES if args.max_pages is None or c[1] <= args.max_pages]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = measure(cases, workdir, args.repeat, args.workers, not args.no_memory)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    print(f"{'case':<12} {'pages':>6} {'sections':>8} {'extract s':>10} {'generate s':>10} "
+          f"{'extract KiB':>12} {'generate KiB':>12} {'bytes':>9}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['pages']:>6} {r['sections']:>8} {r['extract_s']:>10.3f} "
+              f"{r['generate_s']:>10.3f} {r.get('extract_peak_kb', '-'):>12} "
+              f"{r.get('generate_peak_kb', '-'):>12} {r['output_bytes']:>9}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    problems = compare(results, baseline, args)
+    for msg in problems:
+        print(f"REGRESSION {msg}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Text backend benchmark: section scan with pdfplumber vs. PyPDF2 text.
+
+Times ``extract_questions_from_pdf`` (no cache, one worker, best of
+``--repeat``) on synthetic textbooks with each text backend and reports
+the speedup, together with the time spent getting the words of each page
+(the ``extract_words`` phase).  Both scans must find the same sections;
+the exit status is non-zero if they do not or if the PyPDF2 backend is
+less than ``--min-speedup`` times faster.
+
+    python3 benchmarks/bench_text_backends.py [--pages 100 500] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from pdf_generator import PDFGenerator
+from fixtures import make_textbook_pdf
+
+BACKENDS = ('pdfplumber', 'pypdf2')
+
+
+def time_scan(src, backend, repeat):
+    """Best-of-``repeat`` (seconds, extract_words seconds) and the sections found."""
+    best = None
+    for _ in range(max(1, repeat)):
+        with PDFGenerator(text_backend=backend) as gen:
+            t0 = time.perf_counter()
+            gen.extract_questions_from_pdf(src)
+            elapsed = time.perf_counter() - t0
+            words = gen.last_extract_timings.totals.get('extract_words', (0.0,))[0]
+            sections = [(s['section_id'], s['question_count'], s['start_page'], s['end_page'])
+                        for s in gen.sections]
+        if best is None or elapsed < best[0]:
+            best = (elapsed, words)
+    return best, sections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--questions', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-speedup', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'pages':>6} {'backend':<11} {'scan s':>8} {'words s':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            src = make_textbook_pdf(os.path.join(workdir, f"{pages}p.pdf"),
+                                    pages, max(1, pages // 12), args.questions)
+            results = {backend: time_scan(src, backend, args.repeat) for backend in BACKENDS}
+            base = results['pdfplumber'][0][0]
+            for backend in BACKENDS:
+                (elapsed, words), _ = results[backend]
+                print(f"{pages:>6} {backend:<11} {elapsed:>8.3f} {words:>8.3f} "
+                      f"{base / elapsed:>7.1f}x")
+
+            speedup = base / results['pypdf2'][0][0]
+            if results['pypdf2'][1] != results['pdfplumber'][1]:
+                print(f"{pages:>6} MISMATCH: the backends found different sections")
+                failed = True
+            if speedup < args.min_speedup:
+                print(f"{pages:>6} REGRESSION speedup {speedup:.1f}x "
+                      f"(min {args.min_speedup}x)")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Variant benchmark: many worksheets from one scan, one by one vs. batched.
+
+Scans a synthetic textbook once, then renders one worksheet per section
+plus a compact (little answer space) and a print (lots of it) variant of
+the whole set: first as separate ``generate_worksheet_pdf`` calls (each
+plans the source again), then with one ``generate_worksheet_variants``
+call, serially and on ``--workers`` processes.  All three must produce
+byte-identical PDFs; the exit status is non-zero if they do not or if
+the serial batch is less than ``--min-speedup`` times faster.
+
+    python3 benchmarks/bench_variants.py [--pages 300] [--workers 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from pdf_generator import PDFGenerator
+from fixtures import make_textbook_pdf
+
+
+def variant_specs(generator, out_dir, tag):
+    specs = [{'output': os.path.join(out_dir, f"{tag}_{sec['section_id']}.pdf"),
+              'sections': [sec['section_id']]} for sec in generator.sections]
+    specs.append({'output': os.path.join(out_dir, f"{tag}_compact.pdf"), 'answer_space': 60})
+    specs.append({'output': os.path.join(out_dir, f"{tag}_print.pdf"),
+                  'answer_space': 320, 'page_margin': 54})
+    return specs
+
+
+def read_all(specs):
+    outputs = []
+    for spec in specs:
+        with open(spec['output'], 'rb') as f:
+            outputs.append(f.read())
+    return outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--sections', type=int, default=25)
+    parser.add_argument('--questions', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--min-speedup', type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        src = make_textbook_pdf(os.path.join(workdir, 'book.pdf'), args.pages,
+                                args.sections, args.questions)
+        with PDFGenerator(text_backend='pypdf2') as generator:
+            generator.extract_questions_from_pdf(src)
+
+            specs = variant_specs(generator, workdir, 'single')
+            t0 = time.perf_counter()
+            for spec in specs:
+                generator.close()  # a separate request starts from the scan result
+                sections = (generator.select_sections(spec['sections'])
+                            if 'sections' in spec else None)
+                generator.generate_worksheet_pdf(
+                    spec['output'], sections=sections,
+                    answer_space=spec.get('answer_space'),
+                    page_margin=spec.get('page_margin'))
+            single_s = time.perf_counter() - t0
+            reference = read_all(specs)
+
+            results = {}
+            for label, workers in (('batch', 1), (f'batch x{args.workers}', args.workers)):
+                generator.close()
+                specs = variant_specs(generator, workdir, label.replace(' ', ''))
+                t0 = time.perf_counter()
+                generator.generate_worksheet_variants(specs, workers=workers)
+                results[label] = (time.perf_counter() - t0, read_all(specs) == reference)
+
+    print(f"{len(specs)} variants of a {args.pages}-page book")
+    print(f"{'mode':<12} {'s':>8} {'speedup':>8}  identical")
+    print(f"{'separate':<12} {single_s:>8.3f} {1.0:>7.1f}x  -")
+    failed = False
+    for label, (seconds, same) in results.items():
+        print(f"{label:<12} {seconds:>8.3f} {single_s / seconds:>7.1f}x  {'yes' if same else 'NO'}")
+        failed = failed or not same
+    speedup = single_s / results['batch'][0]
+    if speedup < args.min_speedup:
+        print(f"REGRESSION batch only {speedup:.1f}x faster (min {args.min_speedup}x)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: grouping words into lines on dense pages.
+
+Compares the array-backed ``PDFGenerator._words_to_lines`` against the
+previous dict-per-line implementation, and bisect vs. linear y-range
+queries on the resulting lines.
+
+    python3 benchmarks/bench_words_to_lines.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pdf_generator import PDFGenerator
+
+
+def dict_words_to_lines(words, y_tolerance=3):
+    """The previous implementation: one dict per line, text grown by +=."""
+    if not words:
+        return []
+    sorted_words = sorted(words, key=lambda w: (round(w['top'] / y_tolerance), w['x0']))
+    lines = []
+    current_line = {
+        'text': sorted_words[0]['text'],
+        'top': sorted_words[0]['top'],
+        'bottom': sorted_words[0]['bottom'],
+    }
+    for word in sorted_words[1:]:
+        if abs(word['top'] - current_line['top']) <= y_tolerance:
+            current_line['text'] += ' ' + word['text']
+            current_line['bottom'] = max(current_line['bottom'], word['bottom'])
+        else:
+            lines.append(current_line)
+            current_line = {'text': word['text'], 'top': word['top'], 'bottom': word['bottom']}
+    lines.append(current_line)
+    return lines
+
+
+def dense_page_words(n_lines=70, words_per_line=16, seed=0):
+    """Words as pdfplumber reports them for a dense page, in stream order."""
+    rng = random.Random(seed)
+    words = []
+    for line in range(n_lines):
+        top = 50 + line * 10.2 + rng.uniform(-0.4, 0.4)
+        x = 72.0
+        for k in range(words_per_line):
+            width = rng.uniform(12, 40)
+            words.append({
+                'text': f"w{line}.{k}",
+                'x0': x, 'x1': x + width,
+                'top': top + rng.uniform(-0.3, 0.3),
+                'bottom': top + 9 + rng.uniform(-0.3, 0.3),
+            })
+            x += width + 4
+    rng.shuffle(words)
+    return words
+
+
+def main(repeat=5, number=200):
+    words = dense_page_words()
+
+    # Same lines either way
+    old = dict_words_to_lines(words)
+    new = PDFGenerator._words_to_lines(words)
+    assert [l['top'] for l in old] == new.tops
+    assert [l['bottom'] for l in old] == new.bottoms
+    assert [l['text'] for l in old] == new.texts
+
+    t_old = min(timeit.repeat(lambda: dict_words_to_lines(words), repeat=repeat, number=number))
+    t_new = min(timeit.repeat(lambda: PDFGenerator._words_to_lines(words), repeat=repeat, number=number))
+    print(f"words_to_lines ({len(words)} words, {len(new)} lines, {number} pages)")
+    print(f"  dict per line : {t_old * 1000:8.1f} ms")
+    print(f"  PageLines     : {t_new * 1000:8.1f} ms   ({t_old / t_new:.2f}x)")
+
+    boundary = new.tops[len(new) * 2 // 3]
+
+    def linear():
+        for i, line in enumerate(old):
+            if line['top'] >= boundary:
+                return i
+        return len(old)
+
+    t_lin = min(timeit.repeat(linear, repeat=repeat, number=number * 50))
+    t_bis = min(timeit.repeat(lambda: new.index_at(boundary), repeat=repeat, number=number * 50))
+    print(f"boundary query ({number * 50} lookups)")
+    print(f"  linear scan   : {t_lin * 1000:8.1f} ms")
+    print(f"  bisect        : {t_bis * 1000:8.1f} ms   ({t_lin / t_bis:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
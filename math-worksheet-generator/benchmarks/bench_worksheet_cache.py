@@ -0,0 +1,113 @@
+"""
+Worksheet cache benchmark: a repeated request vs. a fresh render.
+
+Runs the service path (``WorksheetService.submit``, one worker) on a
+synthetic textbook three times with a WorksheetCache in a temporary
+directory: the first request misses and renders, the repeat must be a
+hit returning the same bytes, and a request with other spacing must miss
+again.  Also checks that eviction keeps the cache within a small
+``max_entries``, that the metadata counts towards ``max_bytes``, that
+``max_bytes=0`` keeps nothing and that ``copy_to`` raises on a bad
+destination instead of reporting a miss.  The exit status is non-zero if any of that fails or if
+the hit is less than ``--min-speedup`` times faster than the miss.
+
+    python3 benchmarks/bench_worksheet_cache.py [--pages 200] [--min-speedup 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from service import WorksheetService
+from worksheet_cache import WorksheetCache
+from fixtures import make_textbook_pdf
+
+
+def timed(service, pdf_bytes, options):
+    t0 = time.perf_counter()
+    worksheet = service.submit(pdf_bytes, options)
+    return worksheet, time.perf_counter() - t0
+
+
+def check_cache_rules(workdir):
+    """Byte budget, metadata and ``copy_to`` rules of a bare WorksheetCache."""
+    problems = []
+    sources = [b'%PDF source']
+    meta = {'sections': ['x' * 4096]}
+
+    cache = WorksheetCache(os.path.join(workdir, 'rules'))
+    cache.store(sources, {}, b'%PDF worksheet', meta)
+    if cache.stats()['bytes'] < 4096:
+        problems.append(f"metadata not counted: {cache.stats()['bytes']} bytes")
+
+    # The PDF alone fits, the PDF and its metadata do not
+    tight = WorksheetCache(os.path.join(workdir, 'tight'), max_bytes=1024)
+    tight.store(sources, {}, b'%PDF worksheet', meta)
+    if tight.stats()['entries'] or os.listdir(tight.cache_dir):
+        problems.append(f"over-budget entry kept: {os.listdir(tight.cache_dir)}")
+
+    empty = WorksheetCache(os.path.join(workdir, 'empty'), max_bytes=0)
+    empty.store(sources, {}, b'%PDF worksheet')
+    if empty.max_bytes != 0 or empty.stats()['entries']:
+        problems.append(f"max_bytes=0 kept {empty.stats()['entries']} entries")
+
+    try:
+        cache.copy_to(sources, {}, os.path.join(workdir, 'missing', 'out.pdf'))
+        problems.append("copy_to into a missing directory did not raise")
+    except OSError:
+        pass
+    if cache.misses:
+        problems.append("a bad destination was counted as a miss")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=25)
+    parser.add_argument('--min-speedup', type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        src = make_textbook_pdf(os.path.join(workdir, 'book.pdf'), args.pages,
+                                max(1, args.pages // 12), args.questions)
+        with open(src, 'rb') as f:
+            pdf_bytes = f.read()
+        cache = WorksheetCache(os.path.join(workdir, 'worksheets'), max_entries=2)
+        service = WorksheetService(workers=1, output_cache=cache)
+        try:
+            first, miss_s = timed(service, pdf_bytes, {})
+            again, hit_s = timed(service, pdf_bytes, {})
+            _, other_s = timed(service, pdf_bytes, {'answer_space': 120.0})
+            timed(service, pdf_bytes, {'page_margin': 48.0})
+        finally:
+            service.close()
+        stats = cache.stats()
+        problems.extend(check_cache_rules(workdir))
+
+    print(f"{'request':<22} {'s':>8}")
+    print(f"{'first (miss)':<22} {miss_s:>8.3f}")
+    print(f"{'repeat (hit)':<22} {hit_s:>8.4f}")
+    print(f"{'other spacing (miss)':<22} {other_s:>8.3f}")
+    print(f"speedup {miss_s / hit_s:.0f}x; cache {stats}")
+
+    if again != first:
+        problems.append("the hit returned different bytes")
+    if (stats['hits'], stats['misses']) != (1, 3):
+        problems.append(f"expected 1 hit / 3 misses, got {stats['hits']} / {stats['misses']}")
+    if stats['entries'] > 2 or stats['evictions'] != 1:
+        problems.append(f"eviction: {stats['entries']} entries, {stats['evictions']} evicted")
+    if miss_s / hit_s < args.min_speedup:
+        problems.append(f"hit only {miss_s / hit_s:.1f}x faster (min {args.min_speedup}x)")
+
+    for msg in problems:
+        print(f"REGRESSION {msg}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Parity check: the PyPDF2 text backend must find what pdfplumber finds.
+
+Scans every PDF given on the command line (and, unless ``--no-fixtures``,
+synthetic textbooks in every heading style) with both text backends and
+all built-in detection profiles, then compares the sections: ids, titles,
+question counts and page ranges must be identical, and the start / end
+positions may differ by at most ``--tolerance`` points.  A fixture of
+edge cases must also keep the original counting rules (questions above
+a header on its page, ids searched anywhere in a line) with both
+backends.  Exits non-zero on any difference, listing them.  Run it over a folder of real course
+notes before relying on ``--text-backend pypdf2`` for them.
+
+    python3 benchmarks/check_backend_parity.py [notes/*.pdf] [--tolerance 1.0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from detection import BUILTIN_PROFILES
+from pdf_generator import PDFGenerator
+from fixtures import STYLES, make_counting_rules_pdf, make_textbook_pdf
+
+EXACT_FIELDS = ('section_id', 'title', 'question_count', 'start_page', 'end_page')
+POSITION_FIELDS = ('start_y', 'end_y')
+RULES_COUNTS = [('1.7', 5), ('1.8', 3)]  # question counts of make_counting_rules_pdf
+
+
+def scan(pdf_path, backend):
+    with PDFGenerator(text_backend=backend, profiles=list(BUILTIN_PROFILES)) as gen:
+        gen.extract_questions_from_pdf(pdf_path)
+        return gen.sections
+
+
+def compare(reference, candidate, tolerance):
+    """List of differences between two section lists, and the largest y offset."""
+    problems = []
+    worst = 0.0
+    if len(reference) != len(candidate):
+        problems.append(f"{len(reference)} sections vs {len(candidate)}")
+    for ref, cand in zip(reference, candidate):
+        for field in EXACT_FIELDS:
+            if ref[field] != cand[field]:
+                problems.append(f"section {ref['section_id']}: {field} "
+                                f"{ref[field]!r} vs {cand[field]!r}")
+        for field in POSITION_FIELDS:
+            offset = abs(ref[field] - cand[field])
+            worst = max(worst, offset)
+            if offset > tolerance:
+                problems.append(f"section {ref['section_id']}: {field} "
+                                f"{ref[field]:.2f} vs {cand[field]:.2f}")
+    return problems, worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdfs', nargs='*', help="extra PDFs to compare")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="allowed start / end offset in points")
+    parser.add_argument('--pages', type=int, default=60, help="pages per fixture")
+    parser.add_argument('--no-fixtures', action='store_true')
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        inputs = list(args.pdfs)
+        if not args.no_fixtures:
+            for style in list(STYLES) + ['mixed']:
+                inputs.append(make_textbook_pdf(os.path.join(workdir, f"{style}.pdf"),
+                                                args.pages, 6, 12, style=style))
+            rules_pdf = make_counting_rules_pdf(os.path.join(workdir, 'counting_rules.pdf'))
+            inputs.append(rules_pdf)
+
+        print(f"{'pdf':<32} {'sections':>8} {'max dy':>7}  result")
+        for pdf_path in inputs:
+            name = os.path.basename(pdf_path)
+            try:
+                reference = scan(pdf_path, 'pdfplumber')
+                candidate = scan(pdf_path, 'pypdf2')
+            except Exception as e:
+                print(f"{name:<32} {'-':>8} {'-':>7}  ERROR {e}")
+                failed = True
+                continue
+            problems, worst = compare(reference, candidate, args.tolerance)
+            if not args.no_fixtures and pdf_path == rules_pdf:
+                for label, sections in (('pdfplumber', reference), ('pypdf2', candidate)):
+                    counts = [(sec['section_id'], sec['question_count']) for sec in sections]
+                    if counts != RULES_COUNTS:
+                        problems.append(f"{label} counts {counts}, expected {RULES_COUNTS}")
+            print(f"{name:<32} {len(reference):>8} {worst:>7.2f}  "
+                  f"{'MISMATCH' if problems else 'ok'}")
+            for msg in problems:
+                print(f"    {msg}")
+            failed = failed or bool(problems)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
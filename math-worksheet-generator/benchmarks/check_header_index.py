@@ -0,0 +1,89 @@
+"""
+Header index check: ``index_sections`` must find every header a full scan finds.
+
+For every PDF given on the command line, synthetic textbooks in every
+heading style and a page whose second header is split over two text
+objects, the cheap header index is compared with the sections of a full
+scan (ids and start pages), with both text backends and in low-memory
+mode.  Each section is then extracted alone with ``section_ids`` and
+must equal the full scan's, and the index built from a warm section
+cache must equal the one read from the pages.  Exits non-zero on any
+difference.
+
+    python3 benchmarks/check_header_index.py [notes/*.pdf]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from detection import BUILTIN_PROFILES
+from pdf_generator import PDFGenerator
+from section_cache import SectionCache
+from fixtures import STYLES, make_split_header_pdf, make_textbook_pdf
+
+MODES = [('pdfplumber', False), ('pdfplumber', True), ('pypdf2', False), ('pypdf2', True)]
+
+
+def check(pdf_path, backend, low_memory):
+    """List of differences between the index / selected scans and a full scan."""
+    problems = []
+    with PDFGenerator(text_backend=backend, low_memory=low_memory,
+                      profiles=list(BUILTIN_PROFILES)) as gen:
+        gen.extract_questions_from_pdf(pdf_path)
+        full = list(gen.sections)
+        index = gen.index_sections(pdf_path)
+
+        expected = [(sec['section_id'], sec['start_page']) for sec in full]
+        found = [(entry['section_id'], entry['page']) for entry in index]
+        if found != expected:
+            problems.append(f"index {found} vs full scan {expected}")
+
+        for sec in full:
+            gen.extract_questions_from_pdf(pdf_path, section_ids=[sec['section_id']])
+            if gen.sections != [sec]:
+                problems.append(f"section {sec['section_id']} alone: "
+                                f"{[s['section_id'] for s in gen.sections]}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with PDFGenerator(text_backend=backend, low_memory=low_memory,
+                          cache=SectionCache(cache_dir),
+                          profiles=list(BUILTIN_PROFILES)) as gen:
+            gen.extract_questions_from_pdf(pdf_path)
+            cached = gen.index_sections(pdf_path)
+        if cached != index:
+            problems.append(f"index from the cache {cached} vs from the pages {index}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdfs', nargs='*', help="extra PDFs to check")
+    parser.add_argument('--pages', type=int, default=24, help="pages per fixture")
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        inputs = list(args.pdfs)
+        for style in list(STYLES) + ['mixed']:
+            inputs.append(make_textbook_pdf(os.path.join(workdir, f"{style}.pdf"),
+                                            args.pages, 5, 10, style=style))
+        inputs.append(make_split_header_pdf(os.path.join(workdir, 'split_header.pdf')))
+
+        print(f"{'pdf':<24} {'backend':<11} {'low mem':<8} result")
+        for pdf_path in inputs:
+            for backend, low_memory in MODES:
+                problems = check(pdf_path, backend, low_memory)
+                print(f"{os.path.basename(pdf_path):<24} {backend:<11} "
+                      f"{'yes' if low_memory else 'no':<8} {'MISMATCH' if problems else 'ok'}")
+                for msg in problems:
+                    print(f"    {msg}")
+                failed = failed or bool(problems)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
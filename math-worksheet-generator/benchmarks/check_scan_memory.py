@@ -0,0 +1,112 @@
+"""
+Memory check: a low-memory scan must fit a fixed ceiling at any length.
+
+Scans synthetic textbooks of increasing length with
+``PDFGenerator(low_memory=True)``, with every text backend, under
+``tracemalloc`` and checks that
+the scan's working memory (peak minus what stays alive afterwards: the
+sections, the compact line geometry and the open source document) stays
+below ``--ceiling-mb`` for every size.  What stays alive may only grow
+by ``--kept-kb-per-page`` per added page between the shortest and the
+longest document (the sections and line geometry grow with it, a list of
+every page object would not pass).  The default scan is measured
+alongside for comparison.  Exits non-zero if a limit is exceeded or both
+modes disagree on the result.
+
+    python3 benchmarks/check_scan_memory.py [--pages 100 1000] [--ceiling-mb 8]
+                                            [--kept-kb-per-page 2]
+                                            [--backends pdfplumber pypdf2]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from pdf_generator import PDFGenerator
+from fixtures import make_textbook_pdf
+
+
+def scan_memory(src, low_memory, backend=None):
+    """Return (peak KiB, retained KiB, generator) of one traced scan."""
+    gen = PDFGenerator(low_memory=low_memory, text_backend=backend)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        gen.extract_questions_from_pdf(src)
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return peak // 1024, retained // 1024, gen
+
+
+def warm_up(workdir, backends):
+    """One untraced scan per backend, so first-use imports are not counted as kept."""
+    src = make_textbook_pdf(os.path.join(workdir, 'warm_up.pdf'), 2, 1, 2)
+    for backend in backends:
+        PDFGenerator(low_memory=True, text_backend=backend).extract_questions_from_pdf(src)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--ceiling-mb', type=float, default=8)
+    parser.add_argument('--kept-kb-per-page', type=float, default=2.0)
+    parser.add_argument('--skip-default', action='store_true',
+                        help="only measure the low-memory scan")
+    parser.add_argument('--backends', nargs='+', default=sorted(PDFGenerator.TEXT_BACKENDS),
+                        choices=sorted(PDFGenerator.TEXT_BACKENDS))
+    args = parser.parse_args(argv)
+    ceiling_kb = int(args.ceiling_mb * 1024)
+
+    failed = False
+    print(f"{'pages':>6} {'backend':<11} {'mode':<8} {'peak KiB':>10} {'kept KiB':>10} "
+          f"{'working KiB':>12}")
+    kept = {}  # backend -> {pages: retained KiB of the low-memory scan}
+    with tempfile.TemporaryDirectory() as workdir:
+        warm_up(workdir, args.backends)
+        for pages in args.pages:
+            src = make_textbook_pdf(os.path.join(workdir, f"{pages}p.pdf"),
+                                    pages, max(1, pages // 20), 30)
+            modes = [True] if args.skip_default else [True, False]
+            for backend in args.backends:
+                results = {}
+                for low_memory in modes:
+                    peak, retained, gen = scan_memory(src, low_memory, backend)
+                    results[low_memory] = (gen.sections, gen.page_lines)
+                    working = peak - retained
+                    if low_memory:
+                        kept.setdefault(backend, {})[pages] = retained
+                    status = ''
+                    if low_memory and working > ceiling_kb:
+                        status = f'  OVER {ceiling_kb} KiB'
+                        failed = True
+                    print(f"{pages:>6} {backend:<11} {'low' if low_memory else 'default':<8} "
+                          f"{peak:>10} {retained:>10} {working:>12}{status}")
+                if len(results) == 2 and results[True] != results[False]:
+                    print(f"{pages:>6} {backend:<11} MISMATCH between low-memory and "
+                          f"default scan")
+                    failed = True
+
+    for backend, by_pages in kept.items():
+        shortest, longest = min(by_pages), max(by_pages)
+        if longest == shortest:
+            continue
+        per_page = (by_pages[longest] - by_pages[shortest]) / (longest - shortest)
+        status = ''
+        if per_page > args.kept_kb_per_page:
+            status = f'  OVER {args.kept_kb_per_page:g} KiB'
+            failed = True
+        print(f"{backend:<11} low-memory kept memory grows {per_page:.2f} KiB per page"
+              f"{status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Section cache check: damaged entries miss, and the hash memo stays bounded.
+
+Scans a synthetic textbook through a ``SectionCache`` in a temporary
+directory, then overwrites its entry with damaged contents (not JSON, a
+JSON list, a missing key, a section record without fields): each must
+load as a miss, remove the entry, and the next scan must re-store a
+valid one that loads with the original sections.  Finally hashes more
+files than ``HASH_MEMO_SIZE``: the memo must not grow past it.  Exits
+non-zero if any of that does not hold.
+
+    python3 benchmarks/check_section_cache.py [--files 300]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from pdf_generator import PDFGenerator
+from section_cache import SectionCache
+from fixtures import make_textbook_pdf
+
+DAMAGED = {
+    'not json': '{"sections": [',
+    'a list': '[]',
+    'no page_lines': '{"sections": []}',
+    'bad section': '{"sections": [{"title": "1.1"}], "page_lines": []}',
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        src = make_textbook_pdf(os.path.join(workdir, 'book.pdf'), 6, 2, 5)
+        cache = SectionCache(os.path.join(workdir, 'sections'))
+        generator = PDFGenerator(cache=cache)
+        settings = generator._detection_settings()
+        generator.extract_questions_from_pdf(src)
+        expected = generator.sections
+        generator.close()
+        entry_path = cache._entry_path([cache.content_hash(src)], settings)
+
+        for label, text in DAMAGED.items():
+            with open(entry_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            try:
+                loaded = cache.load(src, settings)
+            except Exception as e:
+                problems.append(f"{label}: load raised {e!r}")
+                continue
+            if loaded is not None:
+                problems.append(f"{label}: loaded as a hit")
+            if os.path.exists(entry_path):
+                problems.append(f"{label}: entry not removed")
+
+            generator = PDFGenerator(cache=cache)
+            generator.extract_questions_from_pdf(src)
+            generator.close()
+            loaded = cache.load(src, settings)
+            if loaded is None or loaded[0] != json.loads(json.dumps(expected)):
+                problems.append(f"{label}: re-scan did not restore the entry")
+            print(f"{label:<14} miss, removed and re-stored")
+
+        for i in range(args.files):
+            path = os.path.join(workdir, f"f{i}.pdf")
+            with open(path, 'wb') as f:
+                f.write(b'%PDF ' + str(i).encode('ascii'))
+            cache.content_hash(path)
+        memo = len(cache._hash_memo)
+        print(f"hash memo {memo} entries after {args.files + 1} files "
+              f"(max {cache.HASH_MEMO_SIZE})")
+        if memo > cache.HASH_MEMO_SIZE:
+            problems.append(f"hash memo grew to {memo} entries")
+        if cache.content_hash(path) != cache.content_hash(os.path.abspath(path)):
+            problems.append("memoised hash differs")
+
+    for msg in problems:
+        print(f"FAIL {msg}")
+    if not problems:
+        print("ok")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
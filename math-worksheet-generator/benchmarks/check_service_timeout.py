@@ -0,0 +1,133 @@
+"""
+Service timeout check: a worker that ignores its deadline must not hold a slot.
+
+Runs a ``WorksheetService`` (two workers, no waiting queue, a short
+timeout) whose ``render_job`` is replaced by one that hangs on request.
+More hung jobs than there are slots are sent one after another: each
+must end in ``TimeoutError`` shortly after its deadline, with its worker
+process killed, its slot freed and the pool replaced.  A well-behaved
+job running next to a hung one when its pool is killed must be retried
+and succeed, and a normal request afterwards must still be served.
+Exits non-zero if any of that does not hold.
+
+    python3 benchmarks/check_service_timeout.py [--timeout 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+import service
+from service import WorksheetService
+from fixtures import make_textbook_pdf
+
+real_render_job = service.render_job
+
+
+def hanging_render_job(pdf_path, options, deadline, *args):
+    """``render_job`` that hangs when asked to, or is slow on its first attempt."""
+    if options.get('hang'):
+        time.sleep(3600)  # never checks the deadline
+    if options.get('slow_once') and not os.path.exists(options['slow_once']):
+        open(options['slow_once'], 'w').close()
+        time.sleep(3600)  # only ends when its pool is killed
+    return real_render_job(pdf_path, options, deadline, *args)
+
+
+def worker_pids(service_):
+    return {p.pid for p in (service_.pool._processes or {}).values()}
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    # A killed but not yet reaped child is still listed: check its state
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--timeout', type=float, default=2.0)
+    parser.add_argument('--grace', type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    problems = []
+    service.render_job = hanging_render_job
+    with tempfile.TemporaryDirectory() as workdir:
+        src = make_textbook_pdf(os.path.join(workdir, 'book.pdf'), 6, 2, 5)
+        with open(src, 'rb') as f:
+            pdf_bytes = f.read()
+
+        svc = WorksheetService(workers=2, queue_size=0, timeout=args.timeout)
+        svc.GRACE_S = args.grace
+        try:
+            # More hung jobs than slots: each must give its slot back
+            for i in range(svc.capacity + 1):
+                t0 = time.monotonic()
+                try:
+                    svc.submit(pdf_bytes, {'hang': True})
+                    problems.append(f"hung job {i} returned")
+                except TimeoutError:
+                    took = time.monotonic() - t0
+                    if took > args.timeout + args.grace + 2:
+                        problems.append(f"hung job {i} took {took:.1f}s to time out")
+                except service.QueueFull:
+                    problems.append(f"hung job {i} rejected: slots not freed")
+
+            # A good job sharing the pool with a hung one that gets killed
+            results = {}
+
+            def hang():
+                try:
+                    svc.submit(pdf_bytes, {'hang': True})
+                except TimeoutError:
+                    results['hung'] = 'timed out'
+
+            hung = threading.Thread(target=hang)
+            hung.start()
+            time.sleep(args.timeout - 0.5)
+            pids = worker_pids(svc)
+            good = svc.submit(pdf_bytes, {'slow_once': os.path.join(workdir, 'slow')})
+            hung.join()
+            if not good:
+                problems.append("the job next to the hung one returned no worksheet")
+            if results.get('hung') != 'timed out':
+                problems.append("the hung job did not time out")
+            time.sleep(0.5)
+            if any(alive(pid) for pid in pids):
+                problems.append(f"workers of the killed pool still running: "
+                                f"{sorted(pid for pid in pids if alive(pid))}")
+
+            if not svc.submit(pdf_bytes, {}):
+                problems.append("a normal request after the timeouts failed")
+            health = svc.health()
+        finally:
+            svc.close()
+            service.render_job = real_render_job
+
+    print(f"health {health}")
+    if health['active'] or health['timed_out'] != svc.capacity + 2:
+        problems.append(f"expected 0 active / {svc.capacity + 2} timed out, got "
+                        f"{health['active']} / {health['timed_out']}")
+    if health['recycled'] != svc.capacity + 2:
+        problems.append(f"pool replaced {health['recycled']} times")
+
+    for msg in problems:
+        print(f"FAIL {msg}")
+    if not problems:
+        print("ok")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
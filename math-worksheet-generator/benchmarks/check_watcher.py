@@ -0,0 +1,142 @@
+"""
+Watch-folder check: debouncing, unchanged-content skips and the bounded pool.
+
+Runs a ``FolderWatcher`` (one worker, no waiting queue) on a temporary
+folder and then: writes a PDF slowly in chunks, which must be built once
+and only after the last chunk; drops a burst of ``--burst`` copies, of
+which at most one may be in the pool at any time; touches an already
+built file, which must be skipped as unchanged.  Finally the worksheets
+are written into the watched folder itself (and into a subfolder of a
+recursively watched one): they must never be taken as inputs.  Exits
+non-zero if any of that does not hold.
+
+    python3 benchmarks/check_watcher.py [--burst 6]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from watcher import FolderWatcher
+from fixtures import make_textbook_pdf
+
+
+def wait_idle(watcher, timeout=60):
+    deadline = time.monotonic() + timeout
+    while watcher.pending() and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+def check_output_inside(data, workdir, nested):
+    """Watch a folder that also receives the worksheets; list the problems."""
+    inbox = os.path.join(workdir, 'nested' if nested else 'shared')
+    output_dir = os.path.join(inbox, 'worksheets') if nested else inbox
+    os.makedirs(inbox)
+    with open(os.path.join(inbox, 'book.pdf'), 'wb') as f:
+        f.write(data)
+
+    built = []
+    watcher = FolderWatcher([inbox], output_dir, recursive=nested, interval=0.1,
+                            settle=0, jobs=1, process_options={'use_cache': False},
+                            on_result=built.append)
+    stop = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stop,))
+    thread.start()
+    try:
+        # Long enough for a worksheet of the worksheet to show up
+        time.sleep(3)
+    finally:
+        stop.set()
+        thread.join()
+
+    pdfs = sorted(os.path.relpath(os.path.join(root, name), inbox)
+                  for root, _, names in os.walk(inbox)
+                  for name in names if name.endswith('.pdf'))
+    label = 'subfolder' if nested else 'same folder'
+    print(f"output in {label}: built {len(built)}, pdfs {pdfs}")
+    if [r['input'] for r in built] != [os.path.abspath(os.path.join(inbox, 'book.pdf'))]:
+        return [f"output in {label}: built {[r['input'] for r in built]}"]
+    return []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--burst', type=int, default=6)
+    parser.add_argument('--settle', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        inbox = os.path.join(workdir, 'in')
+        os.makedirs(inbox)
+        src = make_textbook_pdf(os.path.join(workdir, 'book.pdf'), 30, 3, 8)
+        with open(src, 'rb') as f:
+            data = f.read()
+
+        built = []
+        in_pool = []
+        watcher = FolderWatcher([inbox], os.path.join(workdir, 'out'), interval=0.1,
+                                settle=args.settle, jobs=1, queue=0,
+                                process_options={'use_cache': False},
+                                on_result=lambda r: built.append((time.monotonic(), r)))
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        try:
+            # A slow copy: pauses between chunks shorter than the settle time
+            slow = os.path.join(inbox, 'slow.pdf')
+            chunk = len(data) // 4 + 1
+            with open(slow, 'wb') as f:
+                for i in range(0, len(data), chunk):
+                    f.write(data[i:i + chunk])
+                    f.flush()
+                    time.sleep(args.settle / 2)
+            written = time.monotonic()
+            wait_idle(watcher)
+            slow_builds = [t for t, r in built if r['input'] == slow]
+            if len(slow_builds) != 1 or slow_builds[0] < written:
+                problems.append(f"slow copy built {len(slow_builds)} times, "
+                                f"or before it was complete")
+
+            for i in range(args.burst):
+                shutil.copy(src, os.path.join(inbox, f"burst{i}.pdf"))
+            while True:
+                in_pool.append(len(watcher._running))
+                time.sleep(0.05)
+                if not watcher.pending():
+                    break
+
+            unchanged = watcher.stats['unchanged']
+            os.utime(slow)
+            time.sleep(args.settle * 3)
+            wait_idle(watcher)
+        finally:
+            stop.set()
+            thread.join()
+
+        print(f"built {len(built)}, stats {watcher.stats}, most in pool {max(in_pool)}")
+        if len(built) != args.burst + 1:
+            problems.append(f"expected {args.burst + 1} builds, got {len(built)}")
+        if max(in_pool) > 1:
+            problems.append(f"{max(in_pool)} files in the pool at once (max 1)")
+        if watcher.stats['unchanged'] != unchanged + 1:
+            problems.append("a touched but unchanged file was not skipped")
+        failed = [r['input'] for _, r in built if r['status'] != 'ok']
+        if failed:
+            problems.append(f"builds failed: {', '.join(failed)}")
+
+        for nested in (False, True):
+            problems.extend(check_output_inside(data, workdir, nested))
+
+    for msg in problems:
+        print(f"FAILED {msg}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
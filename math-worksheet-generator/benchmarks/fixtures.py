@@ -0,0 +1,182 @@
+"""
+Synthetic "textbook" PDFs for the benchmarks.
+
+The files are written directly as PDF syntax (Helvetica, one content
+stream per page), so no extra packages are needed and the output is
+byte-for-byte reproducible.  Every page has a running header and footer;
+``sections`` pages carry a ``Section X.Y Problems`` header followed by
+``questions`` numbered questions (spilling onto following pages when
+they do not fit), and all other pages are filler prose.  ``style`` picks
+the heading convention (see ``STYLES``); ``'mixed'`` cycles through all
+of them section by section.
+"""
+import os
+
+PAGE_W, PAGE_H = 612, 792
+TOP_Y, BOTTOM_Y = 720, 70   # text area in PDF (bottom-up) coordinates
+LINE_PT = 16
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _section_id(k):
+    return f"{k // 9 + 1}.{k % 9 + 1}"
+
+
+# style -> (header text, question number) for section k with id sec
+STYLES = {
+    'section': (lambda k, sec: f"Section {sec} Problems", lambda sec, q: f"{sec}.{q}."),
+    'exercises': (lambda k, sec: f"Exercises {sec}", lambda sec, q: f"{q}."),
+    'problem_set': (lambda k, sec: f"Problem Set {k + 1}", lambda sec, q: f"{q})"),
+}
+
+
+def _page_plan(pages, sections, questions, style='section'):
+    """Return a list of pages, each a list of (font, size, x, text) lines."""
+    per_page = (TOP_Y - BOTTOM_Y) // LINE_PT
+    sections = max(0, min(sections, pages - 1))
+    starts = {1 + k * (pages - 1) // sections: k for k in range(sections)} if sections else {}
+
+    plan = []
+    pending = []   # question lines of the current section still to place
+    for p in range(pages):
+        lines = []
+        if p in starts:
+            k = starts[p]
+            sec = _section_id(k)
+            names = list(STYLES)
+            header, number = STYLES[names[k % len(names)] if style == 'mixed' else style]
+            lines.append(('F2', 14, 72, header(k, sec)))
+            pending = []
+            for q in range(1, questions + 1):
+                pending.append(('F1', 11, 72, f"{number(sec, q)} Evaluate the expression for question {q} carefully."))
+                pending.append(('F1', 11, 90, "(a) Show every step of the working and state the result."))
+
+        if pending:
+            take = per_page - len(lines)
+            lines.extend(pending[:take])
+            # Questions never run into the next section's header page
+            pending = [] if p + 1 in starts else pending[take:]
+        elif p not in starts:
+            lines.extend(('F1', 11, 72, f"Body text of the chapter, paragraph line {k} on page {p + 1}.")
+                         for k in range(per_page))
+        plan.append(lines)
+    return plan
+
+
+def make_textbook_pdf(path, pages=10, sections=3, questions=6, style='section'):
+    """Write a synthetic textbook PDF to ``path`` and return the path."""
+    page_ops = []
+    for p, lines in enumerate(_page_plan(pages, sections, questions, style)):
+        ops = _running_ops(p)
+        y = TOP_Y
+        for font, size, x, text in lines:
+            ops.append(f"BT /{font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET")
+            y -= LINE_PT
+        page_ops.append(ops)
+    return write_pdf(path, page_ops)
+
+
+def make_split_header_pdf(path):
+    """
+    Two sections whose headers share a page, the second drawn as two text
+    objects ("Section" and "1.2 Problems") a few points apart, so PyPDF2's
+    text joins them without a space while pdfplumber's layout keeps two
+    words.  A second page continues the questions.
+    """
+    ops = _running_ops(0)
+    y = TOP_Y
+    ops.append(f"BT /F2 14 Tf 72 {y} Td (Section 1.1 Problems) Tj ET")
+    for q in range(1, 4):
+        y -= LINE_PT
+        ops.append(f"BT /F1 11 Tf 72 {y} Td (1.1.{q}. Evaluate the expression.) Tj ET")
+    y -= 2 * LINE_PT
+    ops.append(f"BT /F2 14 Tf 72 {y} Td (Section) Tj ET")
+    ops.append(f"BT /F2 14 Tf 129 {y} Td (1.2 Problems) Tj ET")
+    for q in range(1, 4):
+        y -= LINE_PT
+        ops.append(f"BT /F1 11 Tf 72 {y} Td (1.2.{q}. Simplify the expression.) Tj ET")
+    second = _running_ops(1) + [
+        f"BT /F1 11 Tf 72 {TOP_Y} Td (1.2.4. Factor the polynomial.) Tj ET"]
+    return write_pdf(path, [ops, second])
+
+
+def make_counting_rules_pdf(path):
+    """
+    Question lines that test the original counting rules: a question above
+    its own section's header on the header page (counts), a cross reference
+    ``11.7.3`` inside section 1.7 (counts, the id is searched anywhere in
+    the line) and questions of the previous section above the next header.
+    Sections 1.7 and 1.8 have 5 and 3 questions.
+    """
+    pages = [
+        [('F1', "1.7.9. Warm-up: recall the previous chapter."),
+         ('F2', "Section 1.7 Problems"),
+         ('F1', "1.7.1. Evaluate the expression."),
+         ('F1', "See also exercise 11.7.3 of the next volume."),
+         ('F1', "1.7.2. Simplify the expression.")],
+        [('F1', "1.7.3. Factor the polynomial."),
+         ('F1', "1.8.0. Preview question for the next section."),
+         ('F2', "Section 1.8 Problems"),
+         ('F1', "1.8.1. Solve for x."),
+         ('F1', "1.8.2. Solve for y.")],
+    ]
+    page_ops = []
+    for p, lines in enumerate(pages):
+        ops = _running_ops(p)
+        for n, (font, text) in enumerate(lines):
+            size = 14 if font == 'F2' else 11
+            ops.append(f"BT /{font} {size} Tf 72 {TOP_Y - n * LINE_PT} Td ({_escape(text)}) Tj ET")
+        page_ops.append(ops)
+    return write_pdf(path, page_ops)
+
+
+def _running_ops(p):
+    return ["BT /F1 9 Tf 72 770 Td (Chapter notes - running header) Tj ET",
+            f"BT /F1 9 Tf 300 30 Td (Page {p + 1}) Tj ET"]
+
+
+def write_pdf(path, page_ops):
+    """Write pages given as lists of content-stream operators; returns ``path``."""
+    objects = []   # object bodies (bytes), object n is objects[n - 1]
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b'')        # filled in once the page tree exists
+    pages_obj = add(b'')
+    font_regular = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    font_bold = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>")
+
+    kids = []
+    for ops in page_ops:
+        content = "\n".join(ops).encode('latin-1')
+        stream = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_obj, PAGE_W, PAGE_H, font_regular, font_bold, stream)))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(out)
+    return path
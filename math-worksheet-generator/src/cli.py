@@ -0,0 +1,372 @@
+"""
+Headless batch mode: build worksheets for many PDFs without starting the GUI.
+
+    python3 src/cli.py notes/ extra.pdf -o worksheets/ -j 4 --summary summary.json
+
+Every input PDF (directories are searched for ``*.pdf``) gets one
+``<name>_worksheet.pdf`` in the output directory; worksheets (and anything
+under the output directory) are never taken as inputs, so a run can be
+repeated on the same folders.  Documents are processed
+concurrently on a bounded process pool, and a JSON summary with each
+file's sections, timings (with a per-phase breakdown) and errors is
+written at the end.  ``--timings`` also prints a short breakdown per file
+and ``--profile DIR`` saves cProfile stats of every scan and render.
+
+    python3 src/cli.py ch1.pdf ch2.pdf ch3.pdf --combine review.pdf
+
+``--combine`` instead builds a single worksheet from all inputs, with
+their sections in the order given on the command line.  ``--sections``
+restricts worksheets to the given section ids; only the pages those
+sections cover are laid out.  ``--formats`` picks the heading styles to
+detect (see ``detection.BUILTIN_PROFILES``) and ``--text-backend pypdf2``
+reads line positions from the content stream instead of pdfplumber's
+layout (much faster; check with ``benchmarks/check_backend_parity.py``).
+``--output-cache-dir DIR`` keeps finished worksheets: a request for the
+same sources, sections and settings is answered by copying the cached PDF.
+This module never imports Qt.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from detection import BUILTIN_PROFILES
+from pdf_generator import PDFGenerator
+from section_cache import SectionCache
+from worksheet_cache import WorksheetCache
+
+# Names given to worksheets by plan_outputs (and the watcher)
+WORKSHEET_NAME = re.compile(r'_worksheet(_\d+)?\.pdf$', re.IGNORECASE)
+
+
+def collect_inputs(paths, recursive=False, keep_order=False, exclude=()):
+    """
+    Expand files and directories into a de-duplicated list of PDFs.
+
+    The list is sorted, unless ``keep_order`` is set: then the arguments
+    keep their order and only each directory's PDFs are sorted.
+
+    Worksheets are never taken as inputs: directories are searched without
+    their ``*_worksheet.pdf`` files, and nothing is taken from ``exclude``,
+    the output files and directories of this run (an output directory that
+    is itself one of ``paths`` is still searched).
+    """
+    exclude = [os.path.abspath(path) for path in exclude if path]
+    searched = {os.path.abspath(path) for path in paths}
+    excluded_dirs = [path for path in exclude if path not in searched]
+
+    def is_output(path):
+        path = os.path.abspath(path)
+        return path in exclude or any(
+            os.path.commonpath([path, d]) == d for d in excluded_dirs)
+
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                names = [os.path.join(root, n) for root, _, files in os.walk(path)
+                         for n in files if n.lower().endswith('.pdf')]
+            else:
+                names = [os.path.join(path, n) for n in os.listdir(path)
+                         if n.lower().endswith('.pdf')
+                         and os.path.isfile(os.path.join(path, n))]
+            names = [n for n in names if not WORKSHEET_NAME.search(n)]
+            found.extend(sorted(names) if keep_order else names)
+        else:
+            found.append(path)
+
+    seen = set()
+    inputs = []
+    for path in (found if keep_order else sorted(found)):
+        key = os.path.abspath(path)
+        if key not in seen and not is_output(key):
+            seen.add(key)
+            inputs.append(path)
+    return inputs
+
+
+def plan_outputs(inputs, output_dir):
+    """Map each input to ``<output_dir>/<name>_worksheet.pdf`` without clashes."""
+    used = set()
+    outputs = []
+    for path in inputs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = f"{stem}_worksheet.pdf"
+        n = 2
+        while name in used:
+            name = f"{stem}_worksheet_{n}.pdf"
+            n += 1
+        used.add(name)
+        outputs.append(os.path.join(output_dir, name))
+    return outputs
+
+
+def process_pdf(input_path, output_path, cache_dir=None, use_cache=True,
+                profile_dir=None, low_memory=False, workers=1, section_ids=None,
+                formats=None, text_backend=None, output_cache_dir=None,
+                output_cache_bytes=None):
+    """
+    Extract sections from one PDF and write its worksheet; never raises.
+
+    ``input_path`` may also be a list of PDFs, combined into one worksheet
+    (scanned by up to ``workers`` processes); their sections then record
+    the ``source`` file they come from.  ``section_ids`` keeps only those
+    sections; ``formats`` lists the detection profiles to use and
+    ``text_backend`` names the PDFGenerator text backend.
+
+    With ``output_cache_dir`` a worksheet already built from the same
+    sources and settings is copied from the WorksheetCache there (capped
+    at ``output_cache_bytes``) without opening the PDF; the result is then
+    marked ``cached``.
+    """
+    result = {
+        'input': input_path,
+        'output': None,
+        'status': 'ok',
+        'sections': [],
+        'timings': {},
+        'error': None,
+    }
+    cache = SectionCache(cache_dir) if use_cache else None
+    output_cache = None
+    if output_cache_dir:
+        output_cache = WorksheetCache(output_cache_dir, output_cache_bytes)
+    sources = list(input_path) if isinstance(input_path, (list, tuple)) else [input_path]
+    generator = None
+
+    try:
+        generator = PDFGenerator(cache=cache, workers=workers, profile_dir=profile_dir,
+                                 low_memory=low_memory, profiles=formats,
+                                 text_backend=text_backend)
+        if output_cache is not None:
+            settings = generator.worksheet_settings(section_ids)
+            t0 = time.perf_counter()
+            if output_cache.copy_to(sources, settings, output_path):
+                meta = output_cache.load_meta(sources, settings) or {}
+                result['timings']['generate_s'] = round(time.perf_counter() - t0, 4)
+                result['sections'] = meta.get('sections', [])
+                result['output'] = output_path
+                result['output_bytes'] = os.path.getsize(output_path)
+                result['cached'] = True
+                return result
+
+        t0 = time.perf_counter()
+        if isinstance(input_path, (list, tuple)):
+            generator.extract_questions_from_pdfs(input_path)
+            if section_ids is not None:
+                generator.sections = generator.select_sections(section_ids)
+        else:
+            generator.extract_questions_from_pdf(input_path, section_ids=section_ids)
+        result['timings']['extract_s'] = round(time.perf_counter() - t0, 4)
+        result['timings']['extract_phases'] = generator.last_extract_timings.summary()['phases']
+        for sec in generator.sections:
+            row = {
+                'title': sec['title'],
+                'section_id': sec['section_id'],
+                'question_count': sec['question_count'],
+                'start_page': sec['start_page'] + 1,
+                'end_page': sec['end_page'] + 1,
+            }
+            if 'source' in sec:
+                row['source'] = generator.sources[sec['source']]['path']
+            result['sections'].append(row)
+
+        if not generator.sections:
+            result['status'] = 'no_sections'
+            return result
+
+        t0 = time.perf_counter()
+        generator.generate_worksheet_pdf(output_path)
+        result['timings']['generate_s'] = round(time.perf_counter() - t0, 4)
+        result['timings']['generate_phases'] = generator.last_generate_timings.summary()['phases']
+        result['output'] = output_path
+        result['output_bytes'] = generator.last_write_report['bytes']
+        if output_cache is not None:
+            with open(output_path, 'rb') as f:
+                output_cache.store(sources, settings, f.read(),
+                                   {'sections': result['sections']})
+
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        if generator is not None:
+            generator.close()
+
+    return result
+
+
+def format_timings(result):
+    """One line with the slowest phases of a processed file."""
+    parts = []
+    for step in ('extract', 'generate'):
+        phases = result['timings'].get(f'{step}_phases')
+        if phases is None:
+            continue
+        ranked = sorted(phases.items(), key=lambda item: -item[1]['seconds'])[:3]
+        breakdown = ", ".join(f"{phase} {p['seconds']:.2f}s" for phase, p in ranked)
+        parts.append(f"{step} {result['timings'][f'{step}_s']:.2f}s ({breakdown})")
+    name = result['input']
+    if isinstance(name, (list, tuple)):
+        name = " + ".join(name)
+    return f"{name}: " + ("; ".join(parts) or result['status'])
+
+
+def run_batch(inputs, output_dir, jobs=None, cache_dir=None, use_cache=True,
+              profile_dir=None, low_memory=False, section_ids=None, formats=None,
+              text_backend=None, output_cache_dir=None, output_cache_bytes=None):
+    """Process every input on a pool of ``jobs`` processes; return the summary."""
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = plan_outputs(inputs, output_dir)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(inputs) or 1))
+
+    started = time.perf_counter()
+    if jobs == 1:
+        results = [process_pdf(i, o, cache_dir, use_cache, profile_dir, low_memory,
+                               section_ids=section_ids, formats=formats,
+                               text_backend=text_backend,
+                               output_cache_dir=output_cache_dir,
+                               output_cache_bytes=output_cache_bytes)
+                   for i, o in zip(inputs, outputs)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(process_pdf, i, o, cache_dir, use_cache,
+                                   profile_dir, low_memory, section_ids=section_ids,
+                                   formats=formats, text_backend=text_backend,
+                                   output_cache_dir=output_cache_dir,
+                                   output_cache_bytes=output_cache_bytes)
+                       for i, o in zip(inputs, outputs)]
+            results = []
+            for input_path, future in zip(inputs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker process itself died
+                    results.append({
+                        'input': input_path, 'output': None, 'status': 'failed',
+                        'sections': [], 'timings': {}, 'error': str(e),
+                    })
+
+    return {
+        'total': len(results),
+        'ok': sum(1 for r in results if r['status'] == 'ok'),
+        'cached': sum(1 for r in results if r.get('cached')),
+        'no_sections': sum(1 for r in results if r['status'] == 'no_sections'),
+        'failed': sum(1 for r in results if r['status'] == 'failed'),
+        'elapsed_s': round(time.perf_counter() - started, 4),
+        'files': results,
+    }
+
+
+def run_combined(inputs, output_path, jobs=None, cache_dir=None, use_cache=True,
+                 profile_dir=None, low_memory=False, section_ids=None, formats=None,
+                 text_backend=None, output_cache_dir=None, output_cache_bytes=None):
+    """Build one worksheet from all inputs, scanning ``jobs`` at once; return the summary."""
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    result = process_pdf(list(inputs), output_path, cache_dir, use_cache,
+                         profile_dir, low_memory, workers=jobs, section_ids=section_ids,
+                         formats=formats, text_backend=text_backend,
+                         output_cache_dir=output_cache_dir,
+                         output_cache_bytes=output_cache_bytes)
+    return {
+        'total': 1,
+        'ok': int(result['status'] == 'ok'),
+        'cached': int(bool(result.get('cached'))),
+        'no_sections': int(result['status'] == 'no_sections'),
+        'failed': int(result['status'] == 'failed'),
+        'elapsed_s': round(time.perf_counter() - started, 4),
+        'files': [result],
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate worksheets from course-notes PDFs without the GUI.")
+    parser.add_argument('inputs', nargs='+',
+                        help="PDF files and/or directories containing PDFs")
+    parser.add_argument('-o', '--output-dir',
+                        help="directory that receives the worksheets")
+    parser.add_argument('--combine', metavar='OUTPUT', default=None,
+                        help="write one worksheet with the sections of all inputs, "
+                             "in the order given")
+    parser.add_argument('--sections', metavar='ID', nargs='+', default=None,
+                        help="only include these sections, e.g. --sections 2.3 4.1")
+    parser.add_argument('--formats', metavar='NAME', nargs='+', default=None,
+                        choices=sorted(BUILTIN_PROFILES),
+                        help="heading styles to detect (default: section)")
+    parser.add_argument('--text-backend', default=None,
+                        choices=sorted(PDFGenerator.TEXT_BACKENDS),
+                        help="where line text and positions come from "
+                             "(default: pdfplumber; pypdf2 is much faster)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of documents processed at once (default: CPU count)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="search directories recursively")
+    parser.add_argument('--summary', default='-',
+                        help="where to write the JSON summary (default: stdout)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="section cache directory "
+                             "(default: ~/.cache/worksheet-generator/sections)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always re-scan the input PDFs")
+    parser.add_argument('--output-cache-dir', default=None,
+                        help="reuse finished worksheets kept in this directory "
+                             "(default: no worksheet cache)")
+    parser.add_argument('--output-cache-mb', type=float,
+                        default=WorksheetCache.MAX_BYTES / (1024 * 1024),
+                        help="size limit of the worksheet cache (default: %(default)g)")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="keep scan memory flat on very long PDFs")
+    parser.add_argument('--timings', action='store_true',
+                        help="print a short per-phase timing breakdown for every file")
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help="save cProfile stats of every scan and render to DIR")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.output_dir is None and args.combine is None:
+        parser.error("one of -o/--output-dir or --combine is required")
+
+    inputs = collect_inputs(args.inputs, args.recursive, keep_order=bool(args.combine),
+                            exclude=[args.combine or args.output_dir])
+    if not inputs:
+        print("No PDF files found.", file=sys.stderr)
+        return 2
+
+    if args.combine:
+        summary = run_combined(inputs, args.combine, args.jobs, args.cache_dir,
+                               not args.no_cache, args.profile, args.low_memory,
+                               args.sections, args.formats, args.text_backend,
+                               args.output_cache_dir, int(args.output_cache_mb * 1024 * 1024))
+    else:
+        summary = run_batch(inputs, args.output_dir, args.jobs,
+                            args.cache_dir, not args.no_cache, args.profile,
+                            args.low_memory, args.sections, args.formats,
+                            args.text_backend, args.output_cache_dir,
+                            int(args.output_cache_mb * 1024 * 1024))
+
+    if args.timings:
+        for result in summary['files']:
+            print(format_timings(result), file=sys.stderr)
+
+    text = json.dumps(summary, indent=2)
+    if args.summary == '-':
+        print(text)
+    else:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
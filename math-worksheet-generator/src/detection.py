@@ -0,0 +1,171 @@
+"""
+Section heading styles ("detection profiles") and the combined line matcher.
+
+A ``DetectionProfile`` describes one textbook convention: the heading that
+opens a block of problems (``Section 2.3 Problems``, ``Exercises 3.2``,
+``Problem Set 4``) and what a question line of that block looks like.
+Patterns use an ``{id}`` placeholder for the section id; a question
+pattern containing ``{id}`` only counts for the section with that id
+(``2.3.1`` belongs to section 2.3), one without it counts for any open
+section of the same profile (``1.``, ``2.``, ...).  The ``compact_*``
+variants are matched against page text with all whitespace removed by
+the prefilter and the header index, and must accept a superset of what
+the normal patterns accept.
+
+``LineMatcher`` compiles the header and question patterns of all active
+profiles into one regular expression, so every text line is scanned once
+however many formats are enabled.
+"""
+import re
+
+
+class DetectionProfile:
+    """One heading / question-numbering convention."""
+
+    def __init__(self, name, header, question, id_pattern,
+                 compact_header, compact_question):
+        self.name = name
+        self.header = header
+        self.question = question
+        self.id_pattern = id_pattern
+        self.compact_header = compact_header
+        self.compact_question = compact_question
+
+        # The id must be the only capturing group of each pattern
+        for label, pattern in (('header', header), ('question', question)):
+            groups = re.compile(self._expand(pattern, capture=True)).groups
+            expected = 1 if '{id}' in pattern else 0
+            if label == 'header' and '{id}' not in pattern:
+                raise ValueError(f"{name}: header pattern needs an {{id}} placeholder")
+            if groups != expected:
+                raise ValueError(f"{name}: {label} pattern may not use capturing groups "
+                                 f"besides {{id}}; use (?:...)")
+
+    def _expand(self, pattern, capture):
+        id_regex = f'({self.id_pattern})' if capture else f'(?:{self.id_pattern})'
+        return pattern.replace('{id}', id_regex)
+
+    def signature(self):
+        """Everything that changes what this profile matches (cache keying)."""
+        return [self.name, self.header, self.question, self.id_pattern,
+                self.compact_header, self.compact_question]
+
+    def __repr__(self):
+        return f"DetectionProfile({self.name!r})"
+
+
+BUILTIN_PROFILES = {
+    # "Section 2.3 Problems", questions numbered 2.3.1, 2.3.2, ...
+    'section': DetectionProfile(
+        'section',
+        header=r'Section\s+{id}\s+Problems',
+        question=r'{id}\.\d+',
+        id_pattern=r'\d+\.\d+',
+        compact_header=r'Section{id}Problems',
+        compact_question=r'\d+\.\d+\.\d+'),
+    # "Exercises 3.2" at the start of a line, exercises numbered "1.", "2.", ...
+    'exercises': DetectionProfile(
+        'exercises',
+        header=r'^Exercises\s+{id}\b',
+        question=r'^\d{1,3}\.\s',
+        id_pattern=r'\d+\.\d+',
+        compact_header=r'Exercises{id}',
+        compact_question=r'\d\.'),
+    # "Problem Set 4", problems numbered "1.", "2)" or "Problem 3"
+    'problem_set': DetectionProfile(
+        'problem_set',
+        header=r'^Problem\s+Set\s+{id}\b',
+        question=r'^(?:Problem\s+)?\d{1,3}[.)]\s',
+        id_pattern=r'\d+',
+        compact_header=r'ProblemSet{id}',
+        compact_question=r'\d[.)]'),
+}
+
+
+def resolve_profiles(profiles):
+    """Turn profile names and/or DetectionProfile objects into a list of profiles."""
+    resolved = []
+    for profile in profiles:
+        if isinstance(profile, str):
+            if profile not in BUILTIN_PROFILES:
+                raise ValueError(f"Unknown detection profile '{profile}' "
+                                 f"(known: {', '.join(BUILTIN_PROFILES)})")
+            profile = BUILTIN_PROFILES[profile]
+        resolved.append(profile)
+    if not resolved:
+        raise ValueError("At least one detection profile is needed")
+    return resolved
+
+
+class LineMatcher:
+    """
+    All profiles' header and question patterns as one compiled expression.
+
+    ``match(text)`` scans a line once and returns ``(header, questions)``:
+    ``header`` is ``(profile index, section id, header text)`` of the
+    line's first heading or None, ``questions`` a tuple of
+    ``(profile index, section id or None)`` for every question number on
+    the line.  Headings take precedence over question numbers.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = list(profiles)
+        parts = []
+        self._kinds = {}  # group name -> (is header, profile index, id group or None)
+        self._question_patterns = {}  # (profile index, section id) -> compiled pattern
+        for kind, attr in (('h', 'header'), ('q', 'question')):
+            # Patterns anchored at the line start share one "^" test, so they
+            # cost nothing at the other positions of a line
+            anchored, floating = [], []
+            for idx, profile in enumerate(self.profiles):
+                pattern = getattr(profile, attr)
+                target = anchored if pattern.startswith('^') else floating
+                pattern = profile._expand(pattern.lstrip('^'), True)
+                target.append(f'(?P<{kind}{idx}>{pattern})')
+            if anchored:
+                parts.append(f"^(?:{'|'.join(anchored)})")
+            parts.extend(floating)
+        self.regex = re.compile('|'.join(parts))
+        for name, group in self.regex.groupindex.items():
+            kind, idx = name[0], int(name[1:])
+            pattern = self.profiles[idx].header if kind == 'h' else self.profiles[idx].question
+            self._kinds[name] = (kind == 'h', idx, group + 1 if '{id}' in pattern else None)
+
+        self.header_pattern = '|'.join(p._expand(p.header, False) for p in self.profiles)
+        self.compact_header_pattern = '|'.join(
+            p._expand(p.compact_header, False) for p in self.profiles)
+        self.prefilter_pattern = '|'.join(
+            [self.compact_header_pattern] +
+            [p._expand(p.compact_question, False) for p in self.profiles])
+
+    def match(self, text):
+        header = None
+        questions = ()
+        kinds = self._kinds
+        for m in self.regex.finditer(text):
+            is_header, idx, id_group = kinds[m.lastgroup]
+            section_id = m.group(id_group) if id_group is not None else None
+            if is_header:
+                if header is None:
+                    header = (idx, section_id, m.group(m.lastgroup))
+            else:
+                questions += ((idx, section_id),)
+        return header, questions
+
+    def question_pattern(self, profile_idx, section_id):
+        """
+        Compiled question pattern of one section, to ``search`` a line with.
+
+        ``{id}`` becomes the literal section id, so (as for the original
+        ``Section X.Y`` pattern) ``11.7.3`` also counts for section 1.7.
+        """
+        key = (profile_idx, section_id)
+        pattern = self._question_patterns.get(key)
+        if pattern is None:
+            question = self.profiles[profile_idx].question
+            pattern = re.compile(question.replace('{id}', re.escape(section_id)))
+            self._question_patterns[key] = pattern
+        return pattern
+
+    def signature(self):
+        return [p.signature() for p in self.profiles]
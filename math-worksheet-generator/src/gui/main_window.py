@@ -1,11 +1,16 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLabel, QFileDialog, QMessageBox)
+                             QPushButton, QLabel, QFileDialog, QMessageBox,
+                             QProgressBar)
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QFont, QDragEnterEvent, QDropEvent
+import multiprocessing
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pdf_generator import PDFGenerator
+from section_cache import SectionCache
+from timing import PhaseTimings
+from gui.worker import PDFTask
 
 
 class DropArea(QWidget):
@@ -176,9 +181,11 @@ class DropArea(QWidget):
         self._set_idle_style()
 
     def dropEvent(self, event: QDropEvent):
+        # Several PDFs dropped together become one combined worksheet
         files = [u.toLocalFile() for u in event.mimeData().urls()]
-        if files and files[0].lower().endswith('.pdf'):
-            self.parent_window.process_file(files[0])
+        pdfs = [f for f in files if f.lower().endswith('.pdf')]
+        if pdfs:
+            self.parent_window.process_files(pdfs)
         else:
             self._set_idle_style()
 
@@ -186,8 +193,20 @@ class DropArea(QWidget):
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.pdf_generator = PDFGenerator()
-        self.input_pdf_path = None
+        # WORKSHEET_PROFILE_DIR=<dir> saves cProfile stats of every scan / render.
+        # Scans run on a QThread, and forking a threaded Qt process is unsafe:
+        # the layout workers are spawned instead.
+        self.pdf_generator = PDFGenerator(cache=SectionCache(), workers=None,
+                                          profile_dir=os.environ.get('WORKSHEET_PROFILE_DIR'),
+                                          mp_context=multiprocessing.get_context('spawn'))
+        self.input_pdf_paths = []  # in the order their sections appear
+        self.section_summaries = []  # one line per section shown in the picker
+        self.section_index = None  # header index of a single input; None for several
+        self.selected_sections = None  # indices into the picker's sections; None = all
+        self._extracted_selection = []  # selection the sections were extracted for ([] = none)
+        self._task = None      # PDFTask currently running in the background
+        self._thread = None
+        self._sections_found = 0
         self.init_ui()
         
     def init_ui(self):
@@ -240,17 +259,60 @@ class MainWindow(QMainWindow):
         self.drop_area.setMinimumHeight(350)
         drop_layout.addWidget(self.drop_area)
         
-        # Status label – always present and fixed height so the layout never shifts
+        # Status area – always present and fixed height so the layout never shifts
+        status_area = QWidget()
+        status_area.setFixedHeight(36)
+        status_layout = QHBoxLayout()
+        status_layout.setContentsMargins(10, 0, 10, 0)
+        status_layout.setSpacing(8)
+        status_area.setLayout(status_layout)
+
         self.status_label = QLabel("")
         self.status_label.setAlignment(Qt.AlignCenter)
-        self.status_label.setFixedHeight(36)
         self.status_label.setWordWrap(False)
         self.status_label.setStyleSheet("""
             font-size: 13px;
             color: #4A90E2;
             padding: 4px 10px;
         """)
-        drop_layout.addWidget(self.status_label)
+        status_layout.addWidget(self.status_label, 1)
+
+        # Progress bar + cancel button, only visible while a task runs
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFixedWidth(220)
+        self.progress_bar.setFixedHeight(14)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setStyleSheet("""
+            QProgressBar {
+                background-color: #eef4fd;
+                border: none;
+                border-radius: 7px;
+            }
+            QProgressBar::chunk {
+                background-color: #4A90E2;
+                border-radius: 7px;
+            }
+        """)
+        self.progress_bar.hide()
+        status_layout.addWidget(self.progress_bar)
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: transparent;
+                color: #dc3545;
+                border: none;
+                font-size: 13px;
+                font-weight: 600;
+            }
+            QPushButton:hover { color: #a71d2a; }
+        """)
+        self.cancel_btn.setCursor(Qt.PointingHandCursor)
+        self.cancel_btn.clicked.connect(self.cancel_task)
+        self.cancel_btn.hide()
+        status_layout.addWidget(self.cancel_btn)
+
+        drop_layout.addWidget(status_area)
         
         main_layout.addWidget(drop_container)
         
@@ -281,47 +343,217 @@ class MainWindow(QMainWindow):
         self.generate_btn.setCursor(Qt.PointingHandCursor)
         self.generate_btn.clicked.connect(self.generate_worksheet)
         self.generate_btn.hide()
-        main_layout.addWidget(self.generate_btn, alignment=Qt.AlignCenter)
+
+        # Section picker (hidden until file is uploaded)
+        self.sections_btn = QPushButton("Choose Sections")
+        self.sections_btn.setStyleSheet("""
+            QPushButton {
+                background-color: transparent;
+                color: white;
+                border: 2px solid white;
+                border-radius: 25px;
+                padding: 13px 30px;
+                font-size: 16px;
+                font-weight: 600;
+                margin-top: 20px;
+            }
+            QPushButton:hover {
+                background-color: rgba(255, 255, 255, 40);
+            }
+            QPushButton:disabled {
+                color: #dddddd;
+                border-color: #dddddd;
+            }
+        """)
+        self.sections_btn.setCursor(Qt.PointingHandCursor)
+        self.sections_btn.clicked.connect(self.choose_sections)
+        self.sections_btn.hide()
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch(1)
+        buttons_layout.addWidget(self.sections_btn)
+        buttons_layout.addWidget(self.generate_btn)
+        buttons_layout.addStretch(1)
+        main_layout.addLayout(buttons_layout)
         
     def browse_file(self):
-        """Open file dialog to browse for PDF."""
-        file_path, _ = QFileDialog.getOpenFileName(
+        """Open file dialog to browse for one or more PDFs."""
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select Course Notes PDF",
+            "Select Course Notes PDF(s)",
             "",
             "PDF Files (*.pdf)"
         )
         
-        if file_path:
-            self.process_file(file_path)
+        if file_paths:
+            self.process_files(file_paths)
     
     def process_file(self, file_path):
-        """Process the uploaded PDF file."""
-        try:
-            self.input_pdf_path = file_path
-            summaries = self.pdf_generator.extract_questions_from_pdf(file_path)
-            file_name = os.path.basename(file_path)
-
-            if self.pdf_generator.sections:
-                num_sections = len(self.pdf_generator.sections)
-                total_questions = sum(s['question_count'] for s in self.pdf_generator.sections)
-                subtitle = f"{num_sections} section(s)  ·  {total_questions} question(s) found"
-                self.drop_area.show_loaded(file_name, subtitle)
-                self.status_label.setText("")
-                self.generate_btn.show()
-            else:
-                self.drop_area.show_error(file_name, "No 'Section X.Y Problems' found")
-                self.status_label.setText("")
-                self.generate_btn.hide()
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error processing PDF:\n{str(e)}")
+        """Scan the uploaded PDF in the background."""
+        self.process_files([file_path])
+
+    def process_files(self, file_paths):
+        """Scan the uploaded PDFs in the background for one combined worksheet."""
+        if self._task is not None:
+            return  # a scan or render is already running
+
+        file_paths = list(file_paths)
+        self.input_pdf_paths = file_paths
+        self.section_summaries = []
+        self.section_index = None
+        self.selected_sections = None
+        self._extracted_selection = []
+        self.generate_btn.hide()
+        self.sections_btn.hide()
+        self._set_status("⏳  Scanning PDF…" if len(file_paths) == 1
+                         else f"⏳  Scanning {len(file_paths)} PDFs…", "#4A90E2")
+        self._sections_found = 0
+
+        if len(file_paths) == 1:
+            # Only the headers for now: the chosen sections are extracted
+            # on their own once the user has picked them (or generates)
+            timings = PhaseTimings()
+            self._start_task(
+                PDFTask(self.pdf_generator.index_sections, file_paths[0], timings=timings),
+                on_finished=lambda index: self._on_indexed(file_paths[0], index, timings),
+                on_failed=self._on_extract_failed,
+                on_cancelled=self._on_extract_cancelled,
+            )
+            return
+
+        # Combined inputs: a full scan, whose sections carry their source
+        task = PDFTask(self.pdf_generator.extract_questions_from_pdfs, file_paths)
+        task.kwargs['on_section'] = task.partial.emit
+        task.partial.connect(self._on_section_found)
+        self._start_task(
+            task,
+            on_finished=lambda summaries: self._on_extracted(file_paths, summaries),
+            on_failed=self._on_extract_failed,
+            on_cancelled=self._on_extract_cancelled,
+        )
+
+    def _on_section_found(self, section):
+        """Show sections as the scan discovers them."""
+        self._sections_found += 1
+        self._set_status(
+            f"⏳  Scanning PDF…  {self._sections_found} section(s) so far "
+            f"(latest: {section['title']})", "#4A90E2")
+
+    def _on_indexed(self, file_path, index, timings):
+        timings.stop()
+        self.section_index = index
+        if index:
+            self.section_summaries = [f"{entry['title']}  (p.{entry['page'] + 1})"
+                                      for entry in index]
+            self.drop_area.show_loaded(os.path.basename(file_path), self._selection_subtitle())
+            self.generate_btn.show()
+            self.sections_btn.show()
+        else:
+            self.drop_area.show_error(os.path.basename(file_path),
+                                      "No 'Section X.Y Problems' found")
+            self.generate_btn.hide()
+            self.sections_btn.hide()
+        self._show_timings("Indexed", timings)
+
+    def _on_extracted(self, file_paths, summaries):
+        file_name = ", ".join(os.path.basename(path) for path in file_paths)
+        if len(file_paths) > 2:
+            file_name = f"{len(file_paths)} PDFs"
+
+        if self.pdf_generator.sections:
+            self.section_summaries = summaries
+            self.drop_area.show_loaded(file_name, self._selection_subtitle())
+            self.generate_btn.show()
+            self.sections_btn.show()
+        else:
+            self.drop_area.show_error(file_name, "No 'Section X.Y Problems' found")
+            self.generate_btn.hide()
+            self.sections_btn.hide()
+        self._show_timings("Scanned", self.pdf_generator.last_extract_timings)
+
+    def _selection_subtitle(self):
+        """Section / question counts of the current selection for the drop area."""
+        total = len(self.section_summaries)
+        if self.selected_sections is None:
+            counts = f"{total} section(s)"
+        else:
+            counts = f"{len(self.selected_sections)} of {total} section(s) chosen"
+        if self._needs_extract():
+            return counts  # question counts are only known once extracted
+        total_questions = sum(s['question_count'] for s in self._chosen_sections())
+        return f"{counts}  ·  {total_questions} question(s) found"
+
+    def _chosen_sections(self):
+        sections = self.pdf_generator.sections
+        if self.selected_sections is None or self.section_index is not None:
+            return sections  # a single input only has the chosen sections extracted
+        return [sections[idx] for idx in self.selected_sections]
+
+    def _chosen_ids(self):
+        """Section ids of the picked index entries (None = all)."""
+        if self.selected_sections is None:
+            return None
+        return [self.section_index[idx]['section_id'] for idx in self.selected_sections]
+
+    def _needs_extract(self):
+        """True if a single input's chosen sections are not extracted yet."""
+        return (self.section_index is not None
+                and self._extracted_selection != self.selected_sections)
+
+    def choose_sections(self):
+        """Let the user pick which sections to render."""
+        if self._task is not None or not self.section_summaries:
+            return
+        from gui.section_picker import SectionPickerDialog
+        dialog = SectionPickerDialog(self.section_summaries, self.selected_sections, self)
+        if dialog.exec_() != dialog.Accepted:
+            return
+        selected = dialog.selected_indices()
+        self.selected_sections = (None if len(selected) == len(self.section_summaries)
+                                  else selected)
+        self.drop_area.file_sub_label.setText(self._selection_subtitle())
+        if self._needs_extract():
+            self._extract_selection()
+
+    def _extract_selection(self):
+        """Extract just the chosen sections of a single input in the background."""
+        selection = self.selected_sections
+        self._extracted_selection = []
+        self._set_status("⏳  Scanning chosen sections…", "#4A90E2")
+        self._start_task(
+            PDFTask(self.pdf_generator.extract_questions_from_pdf, self.input_pdf_paths[0],
+                    section_ids=self._chosen_ids()),
+            on_finished=lambda _: self._on_selection_extracted(selection),
+            on_failed=self._on_selection_failed,
+            on_cancelled=lambda: self._set_status("Scan cancelled", "#999999"),
+        )
+
+    def _on_selection_extracted(self, selection):
+        self._extracted_selection = selection
+        self.drop_area.file_sub_label.setText(self._selection_subtitle())
+        self._show_timings("Scanned", self.pdf_generator.last_extract_timings)
+
+    def _on_selection_failed(self, message):
+        QMessageBox.critical(self, "Error", f"Error processing PDF:\n{message}")
+        self._set_status("✗  Error scanning sections", "#dc3545")
+
+    def _on_extract_failed(self, message):
+        self.input_pdf_paths = []
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Error", f"Error processing PDF:\n{message}")
+
+    def _on_extract_cancelled(self):
+        self.input_pdf_paths = []
+        self.drop_area.reset()
+        self._set_status("Scan cancelled", "#999999")
     
     def generate_worksheet(self):
-        """Generate the worksheet PDF."""
-        if not self.input_pdf_path:
+        """Generate the worksheet PDF in the background."""
+        if not self.input_pdf_paths:
             QMessageBox.warning(self, "No File", "Please upload a PDF file first.")
             return
+        if self._task is not None:
+            return
         
         # Ask where to save
         output_path, _ = QFileDialog.getSaveFileName(
@@ -334,40 +566,112 @@ class MainWindow(QMainWindow):
         if not output_path:
             return
         
-        try:
-            # Disable button during generation
-            self.generate_btn.setEnabled(False)
-            self.status_label.setText("⏳  Generating worksheet…")
-            self.status_label.setStyleSheet("""
-                font-size: 13px;
-                color: #4A90E2;
-                padding: 4px 10px;
-            """)
-            
-            # Generate PDF
-            self.pdf_generator.generate_worksheet_pdf(output_path)
-            
-            # Success
-            QMessageBox.information(
-                self,
-                "Success",
-                f"Worksheet generated successfully!\n\nSaved to:\n{output_path}"
-            )
-            
-            self.status_label.setText("✓  Worksheet generated successfully!")
-            self.status_label.setStyleSheet("""
-                font-size: 13px;
-                color: #28a745;
-                padding: 4px 10px;
-            """)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error generating worksheet:\n{str(e)}")
-            self.status_label.setText("✗  Error generating worksheet")
-            self.status_label.setStyleSheet("""
-                font-size: 13px;
-                color: #dc3545;
-                padding: 4px 10px;
-            """)
-        finally:
-            self.generate_btn.setEnabled(True)
+        # Disable button during generation
+        self.generate_btn.setEnabled(False)
+        self._set_status("⏳  Generating worksheet…", "#4A90E2")
+        if self._needs_extract():
+            # Not extracted yet (nothing picked): extract, then render
+            selection = self.selected_sections
+            self._extracted_selection = []
+            task = PDFTask(self._extract_and_generate, self.input_pdf_paths[0],
+                           output_path, self._chosen_ids())
+            task.finished.connect(lambda _: self._on_selection_extracted(selection))
+        else:
+            task = PDFTask(self.pdf_generator.generate_worksheet_pdf, output_path,
+                           sections=self._chosen_sections())
+        self._start_task(
+            task,
+            on_finished=lambda _: self._on_generated(output_path),
+            on_failed=self._on_generate_failed,
+            on_cancelled=lambda: self._set_status("Generation cancelled", "#999999"),
+        )
+
+    def _extract_and_generate(self, file_path, output_path, section_ids,
+                              progress=None, cancel_event=None):
+        """Background step: extract the chosen sections of one input and render them."""
+        self.pdf_generator.extract_questions_from_pdf(file_path, progress, cancel_event,
+                                                      section_ids=section_ids)
+        self.pdf_generator.generate_worksheet_pdf(output_path, progress=progress,
+                                                  cancel_event=cancel_event)
+
+    def _on_generated(self, output_path):
+        QMessageBox.information(
+            self,
+            "Success",
+            f"Worksheet generated successfully!\n\nSaved to:\n{output_path}"
+        )
+        timings = self.pdf_generator.last_generate_timings
+        self._set_status(f"✓  Worksheet generated in {timings.format(limit=2)}", "#28a745")
+        self.status_label.setToolTip(timings.format(limit=None))
+
+    def _on_generate_failed(self, message):
+        QMessageBox.critical(self, "Error", f"Error generating worksheet:\n{message}")
+        self._set_status("✗  Error generating worksheet", "#dc3545")
+
+    # ------------------------------------------------------------------
+    # Background tasks
+
+    def _start_task(self, task, on_finished, on_failed, on_cancelled):
+        """Run a PDFTask off the GUI thread, showing progress while it runs."""
+        self._task = task
+        self.drop_area.setAcceptDrops(False)
+        self.drop_area.browse_btn.setEnabled(False)
+        self.sections_btn.setEnabled(False)
+        self.progress_bar.setRange(0, 0)  # busy until the first progress report
+        self.progress_bar.show()
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.show()
+
+        task.progress.connect(self._on_task_progress)
+        task.finished.connect(self._end_task)
+        task.failed.connect(self._end_task)
+        task.cancelled.connect(self._end_task)
+        task.finished.connect(on_finished)
+        task.failed.connect(on_failed)
+        task.cancelled.connect(on_cancelled)
+        self._thread = task.start()
+
+    def _on_task_progress(self, done, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def _end_task(self, *_):
+        if self._thread is not None:
+            self._thread.wait()
+        self._task = None
+        self._thread = None
+        self.progress_bar.hide()
+        self.cancel_btn.hide()
+        self.drop_area.setAcceptDrops(True)
+        self.drop_area.browse_btn.setEnabled(True)
+        self.sections_btn.setEnabled(True)
+        self.generate_btn.setEnabled(True)
+
+    def cancel_task(self):
+        """Ask the running scan or render to stop at its next checkpoint."""
+        if self._task is not None:
+            self._task.cancel()
+            self.cancel_btn.setEnabled(False)
+            self._set_status("Cancelling…", "#999999")
+
+    def _show_timings(self, label, timings):
+        """Put a short timing breakdown in the status area (full one as tooltip)."""
+        self._set_status(f"{label} in {timings.format()}", "#999999")
+        self.status_label.setToolTip(timings.format(limit=None))
+
+    def _set_status(self, text, color):
+        self.status_label.setText(text)
+        self.status_label.setToolTip("")
+        self.status_label.setStyleSheet(f"""
+            font-size: 13px;
+            color: {color};
+            padding: 4px 10px;
+        """)
+
+    def closeEvent(self, event):
+        """Stop any background work before the window goes away."""
+        if self._task is not None:
+            self._task.cancel()
+            self._thread.wait()
+        self.pdf_generator.close()
+        super().closeEvent(event)
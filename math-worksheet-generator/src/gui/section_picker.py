@@ -0,0 +1,66 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QLabel, QListWidget, QListWidgetItem, QDialogButtonBox)
+from PyQt5.QtCore import Qt
+
+
+class SectionPickerDialog(QDialog):
+    """
+    Lets the user tick the sections that go into the worksheet.
+
+    ``summaries`` has one line per extracted section (as returned by the
+    scan) and ``selected`` the indices ticked so far (None = all).
+    After ``exec_()`` returns ``QDialog.Accepted``, ``selected_indices()``
+    holds the new choice.
+    """
+
+    def __init__(self, summaries, selected=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Choose Sections")
+        self.setMinimumSize(460, 420)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        hint = QLabel("Only the ticked sections are cropped into the worksheet.")
+        hint.setStyleSheet("color: #666666; font-size: 13px;")
+        layout.addWidget(hint)
+
+        self.list_widget = QListWidget()
+        for idx, summary in enumerate(summaries):
+            item = QListWidgetItem(summary)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            ticked = selected is None or idx in selected
+            item.setCheckState(Qt.Checked if ticked else Qt.Unchecked)
+            self.list_widget.addItem(item)
+        self.list_widget.itemChanged.connect(self._update_ok)
+        layout.addWidget(self.list_widget)
+
+        # Select all / none shortcuts
+        shortcuts = QHBoxLayout()
+        all_btn = QPushButton("Select All")
+        all_btn.clicked.connect(lambda: self._set_all(Qt.Checked))
+        none_btn = QPushButton("Select None")
+        none_btn.clicked.connect(lambda: self._set_all(Qt.Unchecked))
+        shortcuts.addWidget(all_btn)
+        shortcuts.addWidget(none_btn)
+        shortcuts.addStretch(1)
+        layout.addLayout(shortcuts)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+        layout.addWidget(self.buttons)
+        self._update_ok()
+
+    def _set_all(self, state):
+        for row in range(self.list_widget.count()):
+            self.list_widget.item(row).setCheckState(state)
+
+    def _update_ok(self, *_):
+        # A worksheet needs at least one section
+        self.buttons.button(QDialogButtonBox.Ok).setEnabled(bool(self.selected_indices()))
+
+    def selected_indices(self):
+        """Indices (into the sections passed in) of the ticked rows."""
+        return [row for row in range(self.list_widget.count())
+                if self.list_widget.item(row).checkState() == Qt.Checked]
@@ -0,0 +1,56 @@
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
+import threading
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_generator import OperationCancelled
+
+
+class PDFTask(QObject):
+    """
+    Runs one PDFGenerator call on a background QThread.
+
+    The wrapped callable must accept ``progress`` and ``cancel_event``
+    keyword arguments; progress is forwarded to the GUI thread through the
+    ``progress`` signal and ``cancel()`` stops the call cooperatively.
+    Calls that stream partial results (``on_section``) can forward them
+    through the ``partial`` signal.
+    """
+    progress  = pyqtSignal(int, int)
+    partial   = pyqtSignal(object)
+    finished  = pyqtSignal(object)
+    failed    = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.progress.emit,
+                             cancel_event=self.cancel_event, **self.kwargs)
+        except OperationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(result)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def start(self):
+        """Move the task to a fresh QThread and start it; returns the thread."""
+        thread = QThread()
+        self.moveToThread(thread)
+        thread.started.connect(self.run)
+        # Direct connection: quit from the worker thread as soon as it is done,
+        # so GUI-side handlers can safely wait() on the thread
+        for signal in (self.finished, self.failed, self.cancelled):
+            signal.connect(thread.quit, Qt.DirectConnection)
+        thread.start()
+        return thread
@@ -1,122 +1,1161 @@
-import pdfplumber
-from PyPDF2 import PdfReader, PdfWriter
-from PyPDF2.generic import RectangleObject
+# pdfplumber / pdfminer and PyPDF2 are imported where they are first needed,
+# so importing this module (GUI start-up, CLI argument parsing) stays cheap.
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from bisect import bisect_left
+from itertools import count, islice
 import re
 import copy
+import io
 import os
+import time
+
+from detection import LineMatcher, resolve_profiles
+from source_document import DocumentSet, SourceDocument
+from timing import PhaseTimings, dump_profile, start_profiler
+from worksheet_plan import WorksheetPlan
+
+
+def _num(value):
+    """Format a coordinate for a content stream (no exponent, no trailing zeros)."""
+    text = f"{value:.4f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
+
+
+class OperationCancelled(Exception):
+    """Raised when a scan or render is cancelled through ``cancel_event``."""
+
+
+def _layout_pages(document, first, last, x_tolerance, y_tolerance,
+                  prefilter_pattern=None, timings=None, low_memory=False):
+    """
+    Yield ``(page_height, lines)`` for pages ``first`` .. ``last - 1`` of a
+    SourceDocument (``last=None``: up to the end), in page order.
+
+    Each page's cached layout objects (chars, words, ...) are released as
+    soon as its lines are built, so only the compact PageLines survive.
+    With ``low_memory`` memory use also stops growing with the length of
+    the document: pages are created one at a time instead of through
+    ``pdf.pages`` (which keeps every page object alive), the parsed-object
+    caches of pdfminer and PyPDF2 are emptied after every page, and the
+    prefilter looks pages up one by one instead of flattening the page tree.
+    """
+    from pdfminer.pdfpage import PDFPage
+    from pdfplumber.page import Page
+
+    if timings is None:
+        timings = PhaseTimings()
+    clock = time.perf_counter
+
+    t0 = clock()
+    pdf = document.plumber
+    reader = document.reader if prefilter_pattern else None
+    timings.add('open', clock() - t0)
+
+    if low_memory:
+        page_objs = islice(PDFPage.create_pages(pdf.doc), first, last)
+        pages = (Page(pdf, page_obj, page_number=page_idx + 1)
+                 for page_idx, page_obj in enumerate(page_objs, first))
+    else:
+        stop = len(pdf.pages) if last is None else last
+        pages = (pdf.pages[page_idx] for page_idx in range(first, stop))
+
+    for page_idx in count(first):
+        t0 = clock()
+        page = next(pages, None)
+        if page is None:
+            break
+        timings.add('open', clock() - t0, page=page_idx + 1)
+
+        if reader is None:
+            reader_page = None
+        elif low_memory:
+            reader_page = _reader_page(reader, page.page_obj)
+        else:
+            reader_page = reader.pages[page_idx]
+
+        yield PDFGenerator._page_layout(
+            page, x_tolerance, y_tolerance, reader_page, prefilter_pattern,
+            timings)
+
+        page.close()
+        if low_memory:
+            _release_object_caches(pdf, reader)
+
+
+def _reader_page(reader, page_obj):
+    """
+    PyPDF2 view of one pdfminer page, without flattening the whole page tree.
+
+    Returns None (the page then always gets the full layout) when the page
+    inherits its resources from the tree, which only flattening resolves.
+    """
+    from PyPDF2 import PageObject
+    from PyPDF2.generic import IndirectObject
+
+    try:
+        ref = IndirectObject(page_obj.pageid, 0, reader)
+        reader_page = PageObject(reader, ref)
+        reader_page.update(ref.get_object())
+    except Exception:
+        return None
+    return reader_page if '/Resources' in reader_page else None
+
+
+def _count_pages(document):
+    """Number of pages, from one walk of the page tree that keeps no page."""
+    from pdfminer.pdfpage import PDFPage
+    doc = document.plumber.doc
+    caching, doc.caching = doc.caching, False
+    try:
+        return sum(1 for _ in PDFPage.create_pages(doc))
+    finally:
+        doc.caching = caching
+
+
+def _release_object_caches(pdf, reader):
+    """Forget the objects pdfminer / PyPDF2 parsed so far (they re-parse on demand)."""
+    # Neither library has a public API for this
+    doc = getattr(pdf, 'doc', None)
+    for cache in (getattr(doc, '_cached_objs', None),
+                  getattr(doc, '_parsed_objs', None),
+                  getattr(reader, 'resolved_objects', None)):
+        if cache is not None:
+            cache.clear()
+
+
+def _layout_page_range(pdf_path, first, last, x_tolerance, y_tolerance,
+                       prefilter_pattern=None, low_memory=False, backend='pdfplumber',
+                       header_hint=None):
+    """
+    Process-pool worker: lay out pages ``first`` .. ``last - 1`` of a PDF.
+
+    Each worker opens the file itself and returns ``(layouts, events)``:
+    ``(page_height, lines)`` for every page in its range, in page order,
+    and the timing events of that work for the parent to replay.
+    ``backend`` names the text backend (see ``PDFGenerator.TEXT_BACKENDS``).
+    """
+    events = []
+    timings = PhaseTimings(hook=lambda *event: events.append(event))
+    with SourceDocument(pdf_path) as document:
+        layouts = list(PDFGenerator.TEXT_BACKENDS[backend].layouts(
+            document, first, last, x_tolerance, y_tolerance, prefilter_pattern,
+            timings, low_memory, header_hint))
+    return layouts, events
+
+
+def _scan_document(generator_cls, pdf_path, prefilter=True, low_memory=False,
+                   profiles=None, text_backend=None):
+    """
+    Process-pool worker: scan one whole PDF for a combined worksheet.
+
+    Returns ``(sections, page_lines, events)``, the timing events being
+    replayed by the parent.
+    """
+    events = []
+    with generator_cls(prefilter=prefilter, low_memory=low_memory, profiles=profiles,
+                       text_backend=text_backend,
+                       timing_hook=lambda *event: events.append(event)) as generator:
+        generator.extract_questions_from_pdf(pdf_path)
+        return generator.sections, generator.page_lines, events
+
+
+def _render_variant_group(generator_cls, state, variants, options):
+    """
+    Process-pool worker: render a share of ``generate_worksheet_variants``.
+
+    ``state`` carries the parent's scan result (``pdf_path``, ``sources``,
+    ``sections``, ``page_lines``), so the source is planned once per worker
+    and nothing is scanned again.  Returns the write reports.
+    """
+    with generator_cls() as generator:
+        for name, value in state.items():
+            setattr(generator, name, value)
+        return generator.generate_worksheet_variants(variants, **options)
+
+
+class TextBackend(ABC):
+    """
+    Where a scan gets the positioned text lines of its pages from.
+
+    ``layouts(...)`` yields ``(page_height, lines)`` for pages ``first`` ..
+    ``last - 1`` of a SourceDocument, ``lines`` being the PageLines that
+    ``PDFGenerator._words_to_lines`` builds from the page's words (None for
+    pages the prefilter ruled out), and ``page_count`` says how many pages
+    there are.  ``header_hint`` is ``(compact header pattern, header
+    pattern)`` for backends that need to check they did not garble a
+    header.  Backends keep no state, so process-pool workers look them up
+    by ``name`` in ``PDFGenerator.TEXT_BACKENDS``.  A subclass missing
+    either method cannot be instantiated.
+    """
+    name = None
+
+    @abstractmethod
+    def page_count(self, document, low_memory=False):
+        """Number of pages of ``document``."""
+
+    @abstractmethod
+    def layouts(self, document, first, last, x_tolerance, y_tolerance,
+                prefilter_pattern=None, timings=None, low_memory=False,
+                header_hint=None):
+        """Iterate ``(page_height, lines)`` of pages ``first`` .. ``last - 1``."""
+
+
+class PdfplumberBackend(TextBackend):
+    """pdfplumber's character layout: exact, and most of the cost of a scan."""
+    name = 'pdfplumber'
+
+    def page_count(self, document, low_memory=False):
+        if not low_memory:
+            return len(document.plumber.pages)
+        return _count_pages(document)
+
+    def layouts(self, document, first, last, x_tolerance, y_tolerance,
+                prefilter_pattern=None, timings=None, low_memory=False,
+                header_hint=None):
+        return _layout_pages(document, first, last, x_tolerance, y_tolerance,
+                             prefilter_pattern, timings, low_memory)
+
+
+class PyPDF2Backend(TextBackend):
+    """
+    Positioned text straight from PyPDF2's content-stream interpreter.
+
+    No character layout is done: each run of text PyPDF2 hands out is
+    placed at the text matrix of the first show operator behind it, and
+    its top / bottom follow pdfminer's glyph boxes (font size and the
+    font's descent), so lines come out like pdfplumber's.  Runs on one
+    baseline are joined into a "word" the way PyPDF2 spaced them.  Pages
+    this cannot place reliably - rotated or skewed text, text in form
+    XObjects, a run spanning several lines, unusual page boxes, text the
+    prefilter would not trust, or a header the page text shows but its
+    lines do not (e.g. a word split over two text objects) - are laid out
+    with pdfplumber instead.
+    """
+    name = 'pypdf2'
+
+    DEFAULT_DESCENT = -0.207  # Helvetica's, for fonts without a descriptor
+    SHOW_OPERATORS = (b'Tj', b'TJ', b"'", b'"')
+
+    def page_count(self, document, low_memory=False):
+        if not low_memory:
+            return len(document.reader.pages)
+        return _count_pages(document)
+
+    def layouts(self, document, first, last, x_tolerance, y_tolerance,
+                prefilter_pattern=None, timings=None, low_memory=False,
+                header_hint=None):
+        if timings is None:
+            timings = PhaseTimings()
+        clock = time.perf_counter
+
+        t0 = clock()
+        reader = document.reader
+        if low_memory:
+            # One walk of the page tree, like _layout_pages: reader.pages
+            # would build (and keep) a page object for every page
+            from pdfminer.pdfpage import PDFPage
+            from pdfplumber.page import Page
+            pdf = document.plumber
+            page_objs = islice(PDFPage.create_pages(pdf.doc), first, last)
+            pages = ((_reader_page(reader, page_obj), page_obj) for page_obj in page_objs)
+        else:
+            pdf = None
+            stop = len(reader.pages) if last is None else min(last, len(reader.pages))
+            pages = ((reader.pages[page_idx], None) for page_idx in range(first, stop))
+        timings.add('open', clock() - t0)
+
+        for page_idx in count(first):
+            page_no = page_idx + 1
+            t0 = clock()
+            item = next(pages, None)
+            if item is None:
+                break
+            reader_page, page_obj = item
+            height = None if reader_page is None else self._page_height(reader_page)
+            timings.add('open', clock() - t0, page=page_no)
+
+            layout = None
+            if height is not None:
+                layout = self._page_layout(reader_page, page_no, height, y_tolerance,
+                                           prefilter_pattern, header_hint, timings)
+            if layout is None:
+                # Not placeable from the content stream: full layout
+                if low_memory:
+                    page = Page(pdf, page_obj, page_number=page_no)
+                else:
+                    page = document.plumber.pages[page_idx]
+                layout = PDFGenerator._page_layout(page, x_tolerance, y_tolerance,
+                                                   reader_page, prefilter_pattern, timings)
+                page.close()
+            yield layout
+
+            if low_memory:
+                _release_object_caches(pdf, reader)
+
+    def _page_layout(self, reader_page, page_no, height, y_tolerance, prefilter_pattern,
+                     header_hint, timings):
+        """``(page_height, lines)`` from the content stream, or None to lay the page out."""
+        clock = time.perf_counter
+
+        t0 = clock()
+        words, text = self.words(reader_page, height, y_tolerance)
+        timings.add('extract_words', clock() - t0, page=page_no)
+        if words is None:
+            return None
+
+        compact = re.sub(r'\s+', '', text)
+        if prefilter_pattern and not re.search(prefilter_pattern, compact):
+            return height, None
+
+        t0 = clock()
+        lines = PDFGenerator._words_to_lines(words, y_tolerance)
+        timings.add('words_to_lines', clock() - t0, page=page_no)
+
+        if header_hint is not None:
+            compact_header, header = header_hint
+            shown = sum(len(re.findall(header, line)) for line in lines.texts)
+            if len(re.findall(compact_header, compact)) > shown:
+                return None
+        return height, lines
+
+    @staticmethod
+    def _page_height(reader_page):
+        """Media box height, or None for boxes pdfplumber would map differently."""
+        try:
+            box = reader_page.mediabox
+            rotate = int(reader_page.get('/Rotate', 0) or 0)
+        except Exception:
+            return None
+        if rotate % 360 or float(box.left) or float(box.bottom):
+            return None
+        return float(box.height)
+
+    def words(self, reader_page, height, y_tolerance=3):
+        """
+        ``(words, text)`` of one page: word dicts (``text``, ``x0``, ``top``,
+        ``bottom``) for ``_words_to_lines`` and PyPDF2's plain text, or
+        ``(None, None)`` when the page has to be laid out instead.
+        """
+        try:
+            resources = reader_page['/Resources'].get_object()
+            fonts, xobjects = (resources[key].get_object() if key in resources else {}
+                               for key in ('/Font', '/XObject'))
+        except Exception:
+            return None, None
+
+        runs = []     # [x, baseline, size, descent, text, text object]
+        pending = []  # show operators whose text PyPDF2 has not handed out yet
+        descent, size, leading, rise, text_object = self.DEFAULT_DESCENT, 12.0, 0.0, 0.0, 0
+        usable = True
+
+        def before(op, args, cm, tm):
+            nonlocal descent, size, leading, rise, text_object, usable
+            if op == b'Tf':
+                descent = self._descent(fonts.get(args[0]))
+                size = float(args[1])
+            elif op == b'TL':
+                leading = float(args[0])
+            elif op == b'TD':
+                leading = -float(args[1])
+            elif op == b'Ts':
+                rise = float(args[0])
+            elif op == b'BT':
+                text_object += 1
+            elif op in self.SHOW_OPERATORS:
+                shift = rise
+                if op != b'Tj' and op != b'TJ':
+                    shift -= leading  # ' and " move to the next line first
+                e, f = tm[4] + shift * tm[2], tm[5] + shift * tm[3]
+                if (abs(tm[0] * cm[1] + tm[1] * cm[3]) > 1e-6
+                        or abs(tm[2] * cm[0] + tm[3] * cm[2]) > 1e-6):
+                    usable = False  # rotated or skewed text
+                scale = tm[2] * cm[1] + tm[3] * cm[3]
+                pending.append((e * cm[0] + f * cm[2] + cm[4],
+                                e * cm[1] + f * cm[3] + cm[5],
+                                size * scale, descent, text_object))
+            elif op == b'Do':
+                try:
+                    if xobjects[args[0]].get('/Subtype') == '/Form':
+                        usable = False  # PyPDF2 drops the form's placement
+                except Exception:
+                    usable = False
+
+        def visit(text, cm, tm, font_dict, font_size):
+            nonlocal usable
+            if not text.strip():
+                if text and runs:
+                    runs[-1][4] += text
+            elif not pending:
+                usable = False
+            else:
+                x, y, run_size, run_descent, run_object = pending[0]
+                if any(abs(p[1] - y) > y_tolerance for p in pending):
+                    usable = False  # one run over several lines
+                runs.append([x, y, run_size, run_descent, text, run_object])
+            pending.clear()
+
+        text = PDFGenerator._cheap_text(reader_page, before, visit)
+        if text is None or not usable:
+            return None, None
+
+        # Runs on one baseline become one word, spaced the way PyPDF2 did;
+        # separate text objects that touch without a space get one
+        words = []
+        word = None
+        for x, y, run_size, run_descent, run_text, run_object in runs:
+            if run_size <= 0:
+                return None, None
+            top = height - (y + run_descent * run_size + run_size)
+            bottom = height - (y + run_descent * run_size)
+            # PyPDF2's line breaks are re-derived from the positions
+            run_text = run_text.replace('\n', '')
+            if not run_text:
+                continue
+            if word is not None and abs(y - word['y']) <= y_tolerance:
+                if (run_object != word['object'] and not word['raw'][-1].isspace()
+                        and not run_text[0].isspace()):
+                    word['raw'] += ' '
+                word['raw'] += run_text
+                word['object'] = run_object
+                word['top'] = min(word['top'], top)
+                word['bottom'] = max(word['bottom'], bottom)
+            else:
+                word = {'raw': run_text, 'x0': x, 'y': y, 'object': run_object,
+                        'top': top, 'bottom': bottom}
+                words.append(word)
+
+        for word in words:
+            word['text'] = ' '.join(word['raw'].split())
+        return [w for w in words if w['text']], text
+
+    def _descent(self, font):
+        """The font's descent per point of size, as pdfminer reads it."""
+        try:
+            descriptor = font.get_object().get('/FontDescriptor')
+            if descriptor is None:
+                return self.DEFAULT_DESCENT
+            return float(descriptor.get_object().get('/Descent', 0)) / 1000
+        except Exception:
+            return self.DEFAULT_DESCENT
 
 
 class PDFGenerator:
-    def __init__(self):
+    # ------------------------------------------------------------------
+    # Detection settings (part of the section cache key)
+    DETECTION_PROFILES = ('section',)  # heading styles, see detection.BUILTIN_PROFILES
+    X_TOLERANCE      = 3    # pdfplumber word-grouping tolerances
+    Y_TOLERANCE      = 3
+    HEADER_MARGIN_PT = 50   # running header band skipped at the top of each page
+    FOOTER_MARGIN_PT = 40   # running footer band skipped at the bottom of each page
+
+    # The prefilter matches each page's cheap PyPDF2 text, with all whitespace
+    # removed, against the profiles' compact patterns.  Pages that match
+    # neither a header nor a question number cannot affect the sections and
+    # skip word-level layout.
+
+    # Parallel layout: documents shorter than this are always laid out serially
+    PARALLEL_MIN_PAGES = 32
+
+    # Where page text and line positions come from (see TextBackend)
+    TEXT_BACKEND = 'pdfplumber'
+    TEXT_BACKENDS = {backend.name: backend
+                     for backend in (PdfplumberBackend(), PyPDF2Backend())}
+
+    def __init__(self, cache=None, workers=1, prefilter=True,
+                 timing_hook=None, profile_dir=None, low_memory=False, profiles=None,
+                 text_backend=None, mp_context=None):
         self.pdf_path = None
+        self.document = None  # SourceDocument shared by scanning and rendering
+        self.sources = []  # Combined worksheets: one {path, page_lines} per input PDF
         self.sections = []  # List of {title, start_page, start_y, end_page, end_y, questions}
+        self.section_index = []  # Cheap header index: {section_id, title, page} per header
+        self.page_lines = []  # Per page: list of [top, bottom] per text line (None = not laid out)
+        self.cache = cache  # Optional SectionCache
+        self.workers = workers  # Layout processes; 1 = serial, None = one per CPU
+        self.mp_context = mp_context  # multiprocessing context of the pools (None = default)
+        self.prefilter = prefilter  # Skip layout of pages that cannot hold questions
+        self.low_memory = low_memory  # Keep scan memory flat regardless of page count
+        self.last_write_report = None  # Size report of the last generated worksheet
+        self.timing_hook = timing_hook  # Optional hook(phase, seconds, info) for every timed event
+        self.profile_dir = profile_dir  # Write cProfile stats of each scan / render here
+        self.last_extract_timings = None  # PhaseTimings of the last scan
+        self.last_generate_timings = None  # PhaseTimings of the last render
+        # Profile names / DetectionProfiles to look for; one combined matcher for all
+        self.profiles = resolve_profiles(profiles or self.DETECTION_PROFILES)
+        self.matcher = LineMatcher(self.profiles)
+        backend = text_backend or self.TEXT_BACKEND
+        if backend not in self.TEXT_BACKENDS:
+            raise ValueError(f"Unknown text backend '{backend}' "
+                             f"(known: {', '.join(self.TEXT_BACKENDS)})")
+        self.backend = self.TEXT_BACKENDS[backend]
+
+    def open_document(self, pdf_path):
+        """
+        Return the shared SourceDocument for ``pdf_path``.
+
+        The open document is reused as long as it is the same, unchanged
+        file, so a render after a scan parses nothing again; otherwise it is
+        closed and the new file is mapped.
+        """
+        if self.document is not None and self.document.is_current(pdf_path):
+            return self.document
+        self.close()
+        self.document = SourceDocument(pdf_path)
+        return self.document
+
+    def close(self):
+        """Release the shared document; plans built from it become unusable."""
+        if self.document is not None:
+            self.document.close()
+            self.document = None
+
+    def __enter__(self):
+        return self
 
-    def extract_questions_from_pdf(self, pdf_path):
-        """Scan PDF to find all question sections and their page ranges."""
+    def __exit__(self, *exc):
+        self.close()
+
+    def extract_questions_from_pdf(self, pdf_path, progress=None, cancel_event=None,
+                                   on_section=None, section_ids=None):
+        """
+        Scan PDF to find all question sections and their page ranges.
+
+        ``progress(done, total)`` is called after every page, ``on_section``
+        receives each section as soon as it is complete, and the scan stops
+        with ``OperationCancelled`` once ``cancel_event`` is set.
+
+        With ``section_ids`` (e.g. ``['2.3', '4.1']``) only those sections
+        are extracted: the cheap header index (``index_sections``) locates
+        them and only the pages they cover are laid out and counted, so the
+        cost follows the selection rather than the document size.  Such a
+        partial scan is not stored in the section cache.
+
+        Phase timings end up in ``last_extract_timings``.
+        """
         self.pdf_path = pdf_path
         self.sections = []
+        self.page_lines = []
+        self.sources = []
+        timings = self.last_extract_timings = PhaseTimings(self.timing_hook)
+        profiler = start_profiler(self.profile_dir)
 
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                section_pattern = re.compile(r'Section\s+(\d+\.\d+)\s+Problems')
-
-                # --- Pass 1: find every "Section X.Y Problems" location -----------
-                section_starts = []  # (page_idx, y_top_of_header, section_id)
-
-                for page_idx, page in enumerate(pdf.pages):
-                    page_height = page.height
-                    words = page.extract_words(keep_blank_chars=False, 
-                                                x_tolerance=3, y_tolerance=3)
-                    # Rebuild lines from words
-                    lines = self._words_to_lines(words)
-
-                    for line in lines:
-                        if section_pattern.search(line['text']):
-                            section_starts.append({
-                                'page': page_idx,
-                                'y_top': line['top'],
-                                'title': line['text'].strip(),
-                                'section_id': section_pattern.search(line['text']).group(1),
-                            })
-
-                if not section_starts:
-                    return ["No pages with 'Section X.Y Problems' found."]
-
-                # --- Pass 2: figure out where each section's questions END ---------
-                for i, sec in enumerate(section_starts):
-                    sec_id = sec['section_id']
-                    question_pattern = re.compile(
-                        rf'{re.escape(sec_id)}\.\d+'
-                    )
+            if self.cache is not None:
+                t0 = time.perf_counter()
+                cached = self.cache.load(pdf_path, self._detection_settings())
+                timings.add('cache', time.perf_counter() - t0)
+                if cached is not None:
+                    self.sections, self.page_lines = cached
+                    if section_ids is not None:
+                        self.sections = [sec for sec in self.sections
+                                         if sec['section_id'] in section_ids]
+                    if on_section is not None:
+                        for sec in self.sections:
+                            on_section(sec)
+                    if progress is not None:
+                        progress(len(self.page_lines), len(self.page_lines))
+                    return self._section_summaries()
+
+            if section_ids is not None:
+                self._extract_selected(pdf_path, set(section_ids), progress,
+                                       cancel_event, on_section, timings)
+                return self._section_summaries()
+
+            for sec in self.iter_sections(pdf_path, progress, cancel_event,
+                                          page_lines=self.page_lines,
+                                          timings=timings):
+                self.sections.append(sec)
+                if on_section is not None:
+                    on_section(sec)
 
-                    # Start scanning from the section header page
-                    last_question_page = sec['page']
-                    last_question_bottom = sec['y_top']
-
-                    # The boundary is either the next section start or end of document
-                    if i + 1 < len(section_starts):
-                        boundary_page = section_starts[i + 1]['page']
-                        boundary_y = section_starts[i + 1]['y_top']
-                    else:
-                        boundary_page = total_pages - 1
-                        boundary_y = None  # scan to bottom
-
-                    # Count questions found
-                    question_count = 0
-
-                    for pg in range(sec['page'], boundary_page + 1):
-                        page = pdf.pages[pg]
-                        page_height = page.height
-                        words = page.extract_words(keep_blank_chars=False,
-                                                    x_tolerance=3, y_tolerance=3)
-                        lines = self._words_to_lines(words)
-
-                        for line in lines:
-                            # Stop if we've reached the next section on this page
-                            if pg == boundary_page and boundary_y is not None:
-                                if line['top'] >= boundary_y:
-                                    break
-
-                            # Skip header/footer regions (top 50pt, bottom 50pt)
-                            if line['top'] < 50 or line['bottom'] > page_height - 40:
-                                continue
-
-                            # Check if this line is part of the questions
-                            if question_pattern.search(line['text']):
-                                question_count += 1
-                                last_question_page = pg
-                                last_question_bottom = line['bottom']
-                            elif last_question_page == pg and question_count > 0:
-                                # Continuation of question text (sub-questions, etc.)
-                                last_question_bottom = line['bottom']
-
-                    # Add some padding below the last question
-                    last_question_bottom += 20
-
-                    self.sections.append({
-                        'title': sec['title'],
-                        'section_id': sec_id,
-                        'start_page': sec['page'],
-                        'start_y': sec['y_top'],
-                        'end_page': last_question_page,
-                        'end_y': last_question_bottom,
-                        'question_count': question_count,
-                    })
-
-            # Build summary for GUI
-            summaries = []
-            for sec in self.sections:
-                page_range = f"p.{sec['start_page']+1}"
-                if sec['end_page'] != sec['start_page']:
-                    page_range += f"-{sec['end_page']+1}"
-                summaries.append(
-                    f"{sec['title']}  ({sec['question_count']} questions, {page_range})"
-                )
-            return summaries
+            if self.cache is not None:
+                t0 = time.perf_counter()
+                self.cache.store(pdf_path, self._detection_settings(),
+                                 self.sections, self.page_lines)
+                timings.add('cache', time.perf_counter() - t0)
 
+            return self._section_summaries()
+
+        except OperationCancelled:
+            self.sections = []
+            self.page_lines = []
+            raise
         except Exception as e:
             raise Exception(f"Error extracting questions: {str(e)}")
+        finally:
+            timings.stop()
+            dump_profile(profiler, self._profile_path('extract'))
+
+    def _extract_selected(self, pdf_path, wanted, progress, cancel_event, on_section,
+                          timings):
+        """Fill ``self.sections`` with just the ``wanted`` sections (partial scan)."""
+        index = self.index_sections(pdf_path, cancel_event=cancel_event, timings=timings)
+        selected = [entry for entry in index if entry['section_id'] in wanted]
+        document = self.open_document(pdf_path)
+        self.page_lines = [None] * self.backend.page_count(document, self.low_memory)
+
+        sections = self._iter_selected_sections(
+            document, [entry['page'] for entry in selected], wanted,
+            self.page_lines, timings, cancel_event)
+        for sec in sections:
+            self.sections.append(sec)
+            if on_section is not None:
+                on_section(sec)
+            if progress is not None:
+                progress(len(self.sections), len(selected))
+
+    def extract_questions_from_pdfs(self, pdf_paths, progress=None, cancel_event=None,
+                                    on_section=None):
+        """
+        Scan several PDFs for one combined worksheet.
+
+        Inputs are scanned concurrently, one process per document (up to
+        ``workers``; cached scans are loaded directly), and their sections
+        are merged in the order of ``pdf_paths``.  Each merged section
+        carries ``source``, its input's index in ``self.sources``; page
+        numbers stay relative to that input.  ``progress(done, total)``
+        counts finished documents and ``on_section`` receives a document's
+        sections once it is done.  A single path is scanned like
+        ``extract_questions_from_pdf``.
+        """
+        pdf_paths = list(pdf_paths)
+        if len(pdf_paths) == 1:
+            return self.extract_questions_from_pdf(pdf_paths[0], progress, cancel_event,
+                                                   on_section)
+
+        self.close()
+        self.pdf_path = pdf_paths[0] if pdf_paths else None
+        self.sections = []
+        self.page_lines = []
+        self.sources = []
+        timings = self.last_extract_timings = PhaseTimings(self.timing_hook)
+        profiler = start_profiler(self.profile_dir)
+        results = [None] * len(pdf_paths)  # (sections, page_lines) per input
+        current = None                     # input being loaded, for error messages
+
+        def finished(idx, sections, page_lines):
+            results[idx] = (sections, page_lines)
+            if on_section is not None:
+                for sec in sections:
+                    on_section(dict(sec, source=idx))
+            if progress is not None:
+                progress(sum(r is not None for r in results), len(pdf_paths))
+
+        try:
+            pending = []
+            for idx, pdf_path in enumerate(pdf_paths):
+                current = pdf_path
+                cached = None
+                if self.cache is not None:
+                    t0 = time.perf_counter()
+                    cached = self.cache.load(pdf_path, self._detection_settings())
+                    timings.add('cache', time.perf_counter() - t0)
+                if cached is not None:
+                    finished(idx, *cached)
+                else:
+                    pending.append(idx)
+
+            workers = min(self.workers or os.cpu_count() or 1, len(pending))
+            if workers <= 1:
+                for idx in pending:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise OperationCancelled("Scan cancelled")
+                    current = pdf_paths[idx]
+                    sections, page_lines, events = _scan_document(
+                        type(self), pdf_paths[idx], self.prefilter, self.low_memory,
+                        self.profiles, self.backend.name)
+                    self._store_scan(pdf_paths[idx], sections, page_lines, events, timings)
+                    finished(idx, sections, page_lines)
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=self.mp_context) as pool:
+                    futures = {pool.submit(_scan_document, type(self), pdf_paths[idx],
+                                           self.prefilter, self.low_memory,
+                                           self.profiles, self.backend.name): idx
+                               for idx in pending}
+                    try:
+                        while futures:
+                            done, _ = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise OperationCancelled("Scan cancelled")
+                            for future in done:
+                                idx = futures.pop(future)
+                                current = pdf_paths[idx]
+                                sections, page_lines, events = future.result()
+                                self._store_scan(pdf_paths[idx], sections, page_lines,
+                                                 events, timings)
+                                finished(idx, sections, page_lines)
+                    finally:
+                        for future in futures:
+                            future.cancel()
+
+            current = None
+            for idx, (sections, page_lines) in enumerate(results):
+                self.sources.append({'path': pdf_paths[idx], 'page_lines': page_lines})
+                self.sections.extend(dict(sec, source=idx) for sec in sections)
+
+            return self._section_summaries()
+
+        except OperationCancelled:
+            self.sections = []
+            self.sources = []
+            raise
+        except Exception as e:
+            self.sections = []
+            self.sources = []
+            if current is not None:
+                raise Exception(f"Error extracting questions from "
+                                f"{os.path.basename(current)}: {str(e)}")
+            raise Exception(f"Error extracting questions: {str(e)}")
+        finally:
+            timings.stop()
+            dump_profile(profiler, self._profile_path('extract'))
+
+    def _store_scan(self, pdf_path, sections, page_lines, events, timings):
+        """Cache one input's scan and replay its timing events."""
+        for phase, seconds, info in events:
+            timings.add(phase, seconds, **info)
+        if self.cache is not None:
+            t0 = time.perf_counter()
+            self.cache.store(pdf_path, self._detection_settings(), sections, page_lines)
+            timings.add('cache', time.perf_counter() - t0)
+
+    def iter_sections(self, pdf_path, progress=None, cancel_event=None, page_lines=None,
+                      timings=None):
+        """
+        Yield each section of a PDF as soon as its boundary is known.
+
+        A section is complete when the next header is seen or the document
+        ends, so callers can show results progressively or stop early by
+        closing the generator.  Each page's layout is dropped once it has
+        been swept; pass a list as ``page_lines`` to keep the compact
+        ``[top, bottom]`` line geometry per page.  Phase timings go to
+        ``timings`` (a PhaseTimings) when given.  Does not touch
+        ``self.sections`` or the cache.
+        """
+        if timings is None:
+            timings = PhaseTimings()
+        document = self.open_document(pdf_path)
+        total_pages = self.backend.page_count(document, self.low_memory)
+
+        layouts = self._iter_page_layouts(document, total_pages, timings)
+        open_sec = None
+        try:
+            for page_idx, lines, closed, open_sec in self._sweep(
+                    enumerate(layouts), timings, cancel_event):
+                if page_lines is not None:
+                    page_lines.append(lines.geometry() if lines is not None else None)
+                yield from closed
+                if progress is not None:
+                    progress(page_idx + 1, total_pages)
+        finally:
+            # Shut down the layout pool promptly when the caller stops early
+            layouts.close()
+
+        if open_sec is not None:
+            yield self._finish_section(open_sec)
+
+    def _sweep(self, layouts, timings, cancel_event=None):
+        """
+        Run the section sweep over ``(page_idx, (page_height, lines))`` pairs.
+
+        Yields ``(page_idx, lines, closed, open_sec)`` after every page:
+        the page's lines (None if the prefilter ruled it out), the sections
+        completed on it, and the section still open at its end (None before
+        the first header).  Finishing the last open section is up to the
+        caller, since only it knows whether the document ends there.
+        """
+        clock = time.perf_counter
+        matcher = self.matcher
+
+        # A section's question region runs from the top of its header page
+        # up to the next header (or the end of the document).  While sweeping we keep the
+        # one section that is still "open" and feed it each page's lines;
+        # when the next header appears the open section is closed at that
+        # header and the new one takes over.
+        open_sec = None
+
+        for page_idx, (page_height, lines) in layouts:
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled("Scan cancelled")
+
+            swept = lines
+            if lines is None:
+                # Rejected by the prefilter: nothing on this page can match
+                lines = PageLines([], [], [])
+
+            # Every line is matched once against all profiles together
+            t0 = clock()
+            matches = [matcher.match(text) for text in lines.texts]
+            timings.add('match_lines', clock() - t0, page=page_idx + 1)
+
+            closed = []
+            for idx, (header, _) in enumerate(matches):
+                if header is None:
+                    continue
+                profile_idx, section_id, _ = header
+                top = lines.tops[idx]
+
+                # The previous section ends where this header starts
+                if open_sec is not None:
+                    t0 = clock()
+                    self._scan_section_lines(open_sec, lines, matches, page_idx,
+                                             page_height, top)
+                    timings.add('scan', clock() - t0, page=page_idx + 1,
+                                section=open_sec['section_id'])
+                    closed.append(self._finish_section(open_sec))
+
+                open_sec = {
+                    'page': page_idx,
+                    'y_top': top,
+                    'title': lines.texts[idx].strip(),
+                    'section_id': section_id,
+                    'profile': profile_idx,
+                    'question_pattern': matcher.question_pattern(profile_idx, section_id),
+                    'last_question_page': page_idx,
+                    'last_question_bottom': top,
+                    'question_count': 0,
+                }
+
+            # Whatever section is still open owns the rest of this page
+            if open_sec is not None:
+                t0 = clock()
+                self._scan_section_lines(open_sec, lines, matches, page_idx,
+                                         page_height, None)
+                timings.add('scan', clock() - t0, page=page_idx + 1,
+                            section=open_sec['section_id'])
+
+            yield page_idx, swept, closed, open_sec
+
+    def index_sections(self, pdf_path, progress=None, cancel_event=None, timings=None):
+        """
+        Build the cheap header index: where every section starts.
+
+        Only PyPDF2's content-stream text of each page is read, which costs
+        a small fraction of the word layout a full scan needs.  A page whose
+        cheap text cannot be trusted, or hints at a header that its text
+        lines do not show (more compact-header hits than headers matched,
+        e.g. one split over two lines or two text objects), is laid out like
+        in a full scan, so no header is missed.  Returns (and keeps in
+        ``self.section_index``) one ``{section_id, title, page}`` per header,
+        in document order, ``title`` being the matched header text; question
+        counts and section ends are not known.  If ``cache`` holds a full
+        scan of the file, the index is taken from its sections instead and
+        no page is read.
+        """
+        if timings is None:
+            timings = PhaseTimings()
+        clock = time.perf_counter
+        if self.cache is not None:
+            t0 = clock()
+            cached = self.cache.load(pdf_path, self._detection_settings())
+            timings.add('cache', clock() - t0)
+            if cached is not None:
+                sections, page_lines = cached
+                self.section_index = [
+                    {'section_id': sec['section_id'],
+                     'title': self.matcher.match(sec['title'])[0][2],
+                     'page': sec['start_page']} for sec in sections]
+                if progress is not None:
+                    progress(len(page_lines), len(page_lines))
+                return self.section_index
+
+        document = self.open_document(pdf_path)
+        pdf = document.plumber
+        reader = document.reader
+        total_pages = self.backend.page_count(document, self.low_memory)
+        match = self.matcher.match
+        hint_pattern = re.compile(self.matcher.compact_header_pattern)
+        if self.low_memory:
+            from pdfminer.pdfpage import PDFPage
+            from pdfplumber.page import Page
+            page_objs = PDFPage.create_pages(pdf.doc)
+
+        index = []
+        for page_idx in range(total_pages):
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled("Scan cancelled")
+
+            t0 = clock()
+            if self.low_memory:
+                page_obj = next(page_objs)
+                reader_page = _reader_page(reader, page_obj)
+            else:
+                reader_page = reader.pages[page_idx]
+            text = self._cheap_text(reader_page)
+            headers = None
+            if text is not None:
+                headers = [header for header, _ in
+                           (match(" ".join(line.split())) for line in text.splitlines())
+                           if header]
+                hints = len(hint_pattern.findall(re.sub(r'\s+', '', text)))
+                if hints > len(headers):
+                    headers = None
+            timings.add('index', clock() - t0, page=page_idx + 1)
+
+            if headers is None:
+                # Cheap text is not conclusive: lay the page out
+                if self.low_memory:
+                    page = Page(pdf, page_obj, page_number=page_idx + 1)
+                else:
+                    page = pdf.pages[page_idx]
+                _, lines = self._page_layout(page, self.X_TOLERANCE, self.Y_TOLERANCE,
+                                             timings=timings)
+                page.close()
+                headers = [header for header, _ in map(match, lines.texts) if header]
+
+            index.extend({'section_id': section_id, 'title': title, 'page': page_idx}
+                         for _, section_id, title in headers)
+            if self.low_memory:
+                _release_object_caches(pdf, reader)
+            if progress is not None:
+                progress(page_idx + 1, total_pages)
+
+        self.section_index = index
+        return index
+
+    def _iter_selected_sections(self, document, start_pages, wanted, page_lines,
+                                timings, cancel_event=None):
+        """
+        Yield the sections with an id in ``wanted``, sweeping only their pages.
+
+        Each sweep starts on a selected section's header page (from the
+        header index) and runs for as long as a selected section is open,
+        i.e. up to the next header after it.  Lines before the first header
+        of a sweep belong to an earlier section and are skipped exactly as
+        in a full scan, so every section comes out identical.  Laid-out
+        pages have their line geometry stored in ``page_lines``.
+        """
+        next_page = 0
+        for start in sorted(set(start_pages)):
+            if start < next_page:
+                continue  # already swept as part of the previous run
+
+            layouts = self.backend.layouts(document, start, None, self.X_TOLERANCE,
+                                           self.Y_TOLERANCE, self._prefilter_pattern(),
+                                           timings, self.low_memory, self._header_hint())
+            open_sec = None
+            try:
+                for page_idx, lines, closed, open_sec in self._sweep(
+                        enumerate(layouts, start), timings, cancel_event):
+                    page_lines[page_idx] = lines.geometry() if lines is not None else None
+                    next_page = page_idx + 1
+                    yield from (sec for sec in closed if sec['section_id'] in wanted)
+                    if open_sec is None or open_sec['section_id'] not in wanted:
+                        break
+                else:
+                    # The document ended inside a selected section
+                    if open_sec is not None and open_sec['section_id'] in wanted:
+                        yield self._finish_section(open_sec)
+            finally:
+                layouts.close()
+
+    def _iter_page_layouts(self, document, total_pages, timings):
+        """
+        Yield ``(page_height, lines)`` for every page, in page order.
+        ``lines`` is None for pages the prefilter ruled out.
+
+        With more than one worker the page range is split into contiguous
+        chunks that are laid out in a process pool; results are yielded in
+        the same order as the serial path, so the sweep cannot tell the two
+        apart.  Small documents, ``workers=1`` and platforms where a pool
+        cannot be started fall back to serial layout on ``document``.
+        Workers open the file themselves; their timing events are replayed
+        into ``timings``.
+        """
+        workers = self.workers or os.cpu_count() or 1
+
+        if workers <= 1 or total_pages < self.PARALLEL_MIN_PAGES:
+            yield from self._iter_serial_layouts(document, 0, timings)
+            return
+
+        try:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=self.mp_context)
+        except (OSError, NotImplementedError):
+            yield from self._iter_serial_layouts(document, 0, timings)
+            return
+
+        # A few chunks per worker keeps the pool busy when pages vary in cost
+        n_chunks = min(total_pages, workers * 4)
+        bounds = [total_pages * i // n_chunks for i in range(n_chunks + 1)]
+
+        with pool:
+            futures = [
+                pool.submit(_layout_page_range, document.path, bounds[i], bounds[i + 1],
+                            self.X_TOLERANCE, self.Y_TOLERANCE,
+                            self._prefilter_pattern(), self.low_memory, self.backend.name,
+                            self._header_hint())
+                for i in range(n_chunks)
+            ]
+            done = 0
+            try:
+                for i, future in enumerate(futures):
+                    layouts, events = future.result()
+                    for phase, seconds, info in events:
+                        timings.add(phase, seconds, **info)
+                    yield from layouts
+                    done = bounds[i + 1]
+            except BrokenProcessPool:
+                # Workers died (e.g. killed for memory) - finish serially
+                yield from self._iter_serial_layouts(document, done, timings)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _iter_serial_layouts(self, document, first, timings):
+        """Lay out pages from ``first`` to the end in this process."""
+        return self.backend.layouts(document, first, None, self.X_TOLERANCE,
+                                    self.Y_TOLERANCE, self._prefilter_pattern(), timings,
+                                    self.low_memory, self._header_hint())
+
+    def _prefilter_pattern(self):
+        return self.matcher.prefilter_pattern if self.prefilter else None
+
+    def _header_hint(self):
+        return self.matcher.compact_header_pattern, self.matcher.header_pattern
+
+    @classmethod
+    def _page_layout(cls, page, x_tolerance, y_tolerance,
+                     reader_page=None, prefilter_pattern=None, timings=None):
+        """
+        Extract one pdfplumber page as ``(page_height, lines)``.
+
+        With a prefilter, ``lines`` is None when the page's cheap text shows
+        it cannot contain a header or question.  Each step is recorded in
+        ``timings`` when given.
+        """
+        if timings is None:
+            timings = PhaseTimings()
+        clock = time.perf_counter
+        page_no = page.page_number
+
+        if prefilter_pattern:
+            t0 = clock()
+            candidate = cls._may_match(reader_page, prefilter_pattern)
+            timings.add('prefilter', clock() - t0, page=page_no)
+            if not candidate:
+                return page.height, None
+
+        t0 = clock()
+        words = page.extract_words(keep_blank_chars=False,
+                                   x_tolerance=x_tolerance,
+                                   y_tolerance=y_tolerance)
+        timings.add('extract_words', clock() - t0, page=page_no)
+
+        # Rebuild lines from words
+        t0 = clock()
+        lines = cls._words_to_lines(words, y_tolerance)
+        timings.add('words_to_lines', clock() - t0, page=page_no)
+        return page.height, lines
+
+    @classmethod
+    def _may_match(cls, reader_page, prefilter_pattern):
+        """
+        Cheap check whether a page could hold a header or question line.
+
+        Uses PyPDF2's content-stream text, which is far cheaper than
+        pdfplumber's character layout.  Whitespace is removed before
+        matching so differences in word spacing between the two libraries
+        cannot hide a match.  Whenever the cheap text is unreliable (see
+        ``_cheap_text``) the page is treated as a candidate and gets the
+        full layout, as does a page without a ``reader_page``.
+        """
+        text = cls._cheap_text(reader_page)
+        if text is None:
+            return True
+        return re.search(prefilter_pattern, re.sub(r'\s+', '', text)) is not None
+
+    @staticmethod
+    def _cheap_text(reader_page, visitor_operand_before=None, visitor_text=None):
+        """
+        PyPDF2 text of a page, or None where it cannot be trusted: there is
+        no ``reader_page``, the extraction fails or produces undecodable
+        characters, or it is empty although the page draws text.  The
+        visitors are handed to PyPDF2's ``extract_text``.
+        """
+        if reader_page is None:
+            return None
+        try:
+            text = reader_page.extract_text(visitor_operand_before=visitor_operand_before,
+                                            visitor_text=visitor_text)
+        except Exception:
+            return None
+
+        if '\ufffd' in text or '(cid:' in text:
+            return None
+
+        if not text.strip():
+            # No text found - make sure the page really draws none
+            try:
+                contents = reader_page.get_contents()
+                data = contents.get_data() if contents is not None else b''
+            except Exception:
+                return None
+            if b'Tj' in data or b'TJ' in data or b"'" in data or b'"' in data:
+                return None
+        return text
+
+    def _section_summaries(self):
+        """Build the one-line-per-section summary shown by the GUI."""
+        if not self.sections:
+            return ["No pages with 'Section X.Y Problems' found."]
+
+        summaries = []
+        for sec in self.sections:
+            page_range = f"p.{sec['start_page']+1}"
+            if sec['end_page'] != sec['start_page']:
+                page_range += f"-{sec['end_page']+1}"
+            if 'source' in sec:
+                page_range = f"{os.path.basename(self.sources[sec['source']]['path'])} {page_range}"
+            summaries.append(
+                f"{sec['title']}  ({sec['question_count']} questions, {page_range})"
+            )
+        return summaries
+
+    def _detection_settings(self):
+        """Everything that influences the scan result, for cache keying."""
+        return {
+            'profiles': self.matcher.signature(),
+            'x_tolerance': self.X_TOLERANCE,
+            'y_tolerance': self.Y_TOLERANCE,
+            'header_margin': self.HEADER_MARGIN_PT,
+            'footer_margin': self.FOOTER_MARGIN_PT,
+            'prefilter': self._prefilter_pattern(),
+            'text_backend': self.backend.name,
+        }
+
+    def worksheet_settings(self, section_ids=None,
+                           answer_space=None, section_gap=None, page_margin=None,
+                           use_xobjects=True, optimize=True, object_streams=False,
+                           linearize=False):
+        """
+        Everything besides the source bytes that shapes a finished worksheet,
+        for WorksheetCache keying.
+
+        Takes the section selection and the ``generate_worksheet_pdf``
+        options of a request; spacing left at None is resolved to the class
+        constants, so a subclass with other defaults gets other keys.  The
+        title is not rendered into the worksheet and so is not part of it.
+        """
+        return {
+            'version': self.OUTPUT_VERSION,
+            'detection': self._detection_settings(),
+            'sections': sorted(set(section_ids)) if section_ids is not None else None,
+            'answer_space': self.ANSWER_SPACE_PT if answer_space is None else answer_space,
+            'section_gap': self.SECTION_GAP_PT if section_gap is None else section_gap,
+            'page_margin': self.PAGE_MARGIN_PT if page_margin is None else page_margin,
+            'header_margin': self.HEADER_MARGIN_PT,
+            'footer_margin': self.FOOTER_MARGIN_PT,
+            'write': [use_xobjects, optimize, object_streams, linearize],
+        }
+
+    def _profile_path(self, operation):
+        """Where cProfile stats of ``operation`` on the current PDF are written."""
+        if not self.profile_dir:
+            return None
+        stem = os.path.splitext(os.path.basename(self.pdf_path or 'worksheet'))[0]
+        return os.path.join(self.profile_dir, f"{stem}.{operation}.prof")
 
     # ------------------------------------------------------------------
     # Spacing constants
@@ -124,165 +1163,472 @@ class PDFGenerator:
     SECTION_GAP_PT  = 28    # extra gap between sections
     PAGE_MARGIN_PT  = 36    # top/bottom margin when slicing into pages
 
-    def generate_worksheet_pdf(self, output_path, title="Math Worksheet"):
+    # Rendering revision, part of the worksheet cache key: bump it whenever a
+    # change makes the same sources and settings produce a different PDF
+    OUTPUT_VERSION = 2
+
+    def plan_worksheet(self, sections=None):
+        """
+        Build a reusable WorksheetPlan from ``self.sections``.
+
+        ``sections`` restricts the plan to a subset of ``self.sections``
+        (e.g. picked with ``select_sections``); only the source pages those
+        sections cover are measured and later cropped.  The plan holds the
+        cropped strip list and the shared source reader (usable until the
+        document is closed); pass it to ``generate_worksheet_pdf`` to
+        re-render with different spacing or margins without re-reading the
+        source PDF.
+        """
+        if sections is None:
+            sections = self.sections
+        if not self.pdf_path or not sections:
+            raise Exception("No questions to generate. Please extract questions first.")
+
+        try:
+            if self.sources:
+                return self._plan_combined(sections)
+            return WorksheetPlan(self.open_document(self.pdf_path).reader, sections,
+                                 self.HEADER_MARGIN_PT, self.FOOTER_MARGIN_PT,
+                                 self.page_lines)
+        except Exception as e:
+            raise Exception(f"Error planning worksheet: {str(e)}")
+
+    def select_sections(self, section_ids):
+        """The extracted sections whose id is in ``section_ids``, in document order."""
+        section_ids = set(section_ids)
+        return [sec for sec in self.sections if sec['section_id'] in section_ids]
+
+    def _plan_combined(self, sections):
+        """
+        Plan a worksheet of ``sections`` over all ``self.sources``.
+
+        The inputs are put behind one running page index (a DocumentSet)
+        and every section is shifted into it.  Each input is mapped only
+        while its pages are measured, and again while they are rendered.
+        """
+        documents = DocumentSet([src['path'] for src in self.sources],
+                                [len(src['page_lines']) for src in self.sources])
+        shifted = []
+        for sec in sections:
+            offset = documents.offsets[sec['source']]
+            shifted.append(dict(sec, start_page=sec['start_page'] + offset,
+                                end_page=sec['end_page'] + offset))
+        page_lines = [lines for src in self.sources for lines in src['page_lines']]
+        try:
+            return WorksheetPlan(documents, shifted, self.HEADER_MARGIN_PT,
+                                 self.FOOTER_MARGIN_PT, page_lines)
+        finally:
+            documents.close()
+
+    def generate_worksheet_bytes(self, **kwargs):
+        """
+        Render the worksheet in memory and return the PDF as ``bytes``.
+
+        Takes the same keyword arguments as ``generate_worksheet_pdf``.
+        """
+        buf = io.BytesIO()
+        self.generate_worksheet_pdf(buf, **kwargs)
+        return buf.getvalue()
+
+    def generate_worksheet_pdf(self, output_path, title="Math Worksheet",
+                               progress=None, cancel_event=None, use_xobjects=True,
+                               optimize=True, object_streams=False, linearize=False,
+                               plan=None, answer_space=None, section_gap=None,
+                               page_margin=None, sections=None):
         """
         Build a worksheet PDF with a two-phase approach:
 
         Phase 1 – Assemble one tall "scroll" page that contains every
                   question region (cropped from the source PDF) separated
-                  by blank answer space.
+                  by blank answer space.  This is the WorksheetPlan; pass
+                  ``plan`` to reuse one from ``plan_worksheet()``, or
+                  ``sections`` to include only those of ``self.sections``.
 
         Phase 2 – Slice that scroll into standard letter-sized pages and
-                  write the final multi-page PDF.
+                  write the final multi-page PDF.  ``answer_space``,
+                  ``section_gap`` and ``page_margin`` override the class
+                  spacing constants for this render only.
+
+        With ``use_xobjects`` (the default) every source page that is needed
+        becomes one shared Form XObject, and each strip just places it with
+        a clip rectangle and a translation, so a page used by several strips
+        is stored once.  ``use_xobjects=False`` merges a cropped copy of the
+        page for every strip instead.
+
+        ``optimize`` compresses streams and merges identical objects before
+        writing; ``object_streams`` and ``linearize`` additionally need the
+        optional pikepdf package.  The write report (byte count and how many
+        objects were compressed / merged) is kept in ``last_write_report``.
+
+        ``output_path`` may also be a writable binary stream (a file
+        object, ``io.BytesIO``, a socket file, ...); it is written to but
+        not closed.  ``progress(done, total)`` is called as strips are
+        placed, and rendering stops with ``OperationCancelled`` once
+        ``cancel_event`` is set (the output is then not written).  Phase
+        timings end up in ``last_generate_timings``.
         """
-        if not self.pdf_path or not self.sections:
-            raise Exception("No questions to generate. Please extract questions first.")
+        timings = self.last_generate_timings = PhaseTimings(self.timing_hook)
+        clock = time.perf_counter
 
+        if plan is None:
+            t0 = clock()
+            plan = self.plan_worksheet(sections)
+            timings.add('plan', clock() - t0)
+
+        if answer_space is None:
+            answer_space = self.ANSWER_SPACE_PT
+        if section_gap is None:
+            section_gap = self.SECTION_GAP_PT
+        if page_margin is None:
+            page_margin = self.PAGE_MARGIN_PT
+
+        documents = plan.reader if isinstance(plan.reader, DocumentSet) else None
+        if documents is not None:
+            # Merged pages keep pointing into their source until written
+            documents.one_at_a_time = use_xobjects
+
+        profiler = start_profiler(self.profile_dir)
         try:
-            reader = PdfReader(self.pdf_path)
-
-            # Derive page dimensions from the first source page
-            ref_page   = reader.pages[self.sections[0]['start_page']]
-            PAGE_W     = float(ref_page.mediabox.width)   # e.g. 612 pt (letter)
-            PAGE_H     = float(ref_page.mediabox.height)  # e.g. 792 pt (letter)
-
-            # ----------------------------------------------------------
-            # Phase 1: collect (cropped_page_obj, strip_height) pairs
-            #          and compute the total scroll height.
-            # ----------------------------------------------------------
-            strips = []   # list of (PyPDF2 page object, strip_height_pt)
-
-            for sec_idx, sec in enumerate(self.sections):
-                for pg_idx in range(sec['start_page'], sec['end_page'] + 1):
-                    original    = reader.pages[pg_idx]
-                    page_height = float(original.mediabox.height)
-
-                    # --- crop bounds in pdfplumber (top-down) coords ---
-                    if pg_idx == sec['start_page']:
-                        crop_top = max(sec['start_y'] - 10, 0)
-                    else:
-                        crop_top = 50   # skip running header
-
-                    if pg_idx == sec['end_page']:
-                        crop_bot = min(sec['end_y'], page_height)
-                    else:
-                        crop_bot = page_height - 40   # skip running footer
-
-                    strip_h = crop_bot - crop_top
-                    if strip_h <= 0:
-                        continue
-
-                    # Convert to PDF (bottom-up) coordinates
-                    pdf_lower = page_height - crop_bot
-                    pdf_upper = page_height - crop_top
-
-                    cropped = copy.copy(original)
-                    cropped.mediabox = RectangleObject([0, pdf_lower, PAGE_W, pdf_upper])
-                    strips.append((cropped, strip_h))
-
-                # After every section add an answer-space marker (None = blank gap)
-                strips.append((None, self.ANSWER_SPACE_PT))
-
-                # Extra visual gap between sections (except after the last one)
-                if sec_idx < len(self.sections) - 1:
-                    strips.append((None, self.SECTION_GAP_PT))
-
-            # ----------------------------------------------------------
-            # Phase 2: slice the scroll into letter pages.
-            #
-            # Strategy: walk through strips top-to-bottom.  Each strip is
-            # either a real cropped page or a blank gap.  Accumulate content
-            # onto the current output page; when a strip would overflow, emit
-            # the current page and start a new one.
-            # ----------------------------------------------------------
-            writer = PdfWriter()
-
-            usable_h   = PAGE_H - 2 * self.PAGE_MARGIN_PT
-            cursor_y   = usable_h   # remaining space on current output page
-            cur_page_h = 0          # how much of usable_h has been consumed
-
-            def flush_page(pending_strips, total_h):
-                """Create one output page from the accumulated pending strips."""
-                out_page = writer.add_blank_page(width=PAGE_W, height=PAGE_H)
-                for (strip, sh, dest_y_bot) in pending_strips:
-                    if strip is None:
-                        continue  # blank gap – nothing to draw
-                    # Merge the cropped strip onto out_page at the right y-offset.
-                    # PyPDF2's merge_page uses a transformation matrix.
-                    # We need to translate the strip so its bottom lands at dest_y_bot.
-                    # The strip's own coordinate system starts at pdf_lower (already 0
-                    # after cropping sets mediabox lower = pdf_lower, but the content
-                    # stream still uses original coords).
-                    # Use mergeTransformedPage with a vertical translation.
-                    strip_mb_bottom = float(strip.mediabox.lower_left[1])
-                    tx = self.PAGE_MARGIN_PT   # left margin indent (same as source)
-                    ty = dest_y_bot - strip_mb_bottom
-                    out_page.mergeTransformedPage(strip, [1, 0, 0, 1, tx, ty])
-
-            y_bottom = PAGE_H - self.PAGE_MARGIN_PT  # current top-of-page in PDF coords (from bottom)
-            page_strips = []
-
-            for (strip, sh) in strips:
-                if sh > usable_h:
-                    # Strip is taller than a full page – scale it down by splitting
-                    # at page boundaries (rare edge case: just let it overflow for now)
-                    sh = usable_h
-
-                if sh > cursor_y:
-                    # Flush current page
-                    flush_page(page_strips, cur_page_h)
-                    # Start new page
-                    cursor_y   = usable_h
-                    y_bottom   = PAGE_H - self.PAGE_MARGIN_PT
-                    page_strips = []
-                    cur_page_h  = 0
-
-                dest_y_bot = y_bottom - sh
-                page_strips.append((strip, sh, dest_y_bot))
-                y_bottom   -= sh
-                cursor_y   -= sh
-                cur_page_h += sh
-
-            # Flush the last (possibly partial) page
-            if page_strips:
-                flush_page(page_strips, cur_page_h)
-
-            with open(output_path, 'wb') as f:
-                writer.write(f)
+            t0 = clock()
+            pages = plan.paginate(answer_space, section_gap, page_margin)
+            timings.add('paginate', clock() - t0)
+            writer = self._render_pages(plan, pages, page_margin, use_xobjects,
+                                        progress, cancel_event, timings)
+
+            t0 = clock()
+            from pdf_output import write_pdf
+            if hasattr(output_path, 'write'):
+                self.last_write_report = write_pdf(writer, output_path, optimize,
+                                                   object_streams, linearize)
+            else:
+                with open(output_path, 'wb') as f:
+                    self.last_write_report = write_pdf(writer, f, optimize,
+                                                       object_streams, linearize)
+            timings.add('write', clock() - t0)
 
             return True
 
+        except OperationCancelled:
+            raise
         except Exception as e:
             raise Exception(f"Error generating PDF: {str(e)}")
+        finally:
+            if documents is not None:
+                documents.close()
+                documents.one_at_a_time = True
+            timings.stop()
+            dump_profile(profiler, self._profile_path('generate'))
+
+    # Keys of a variant spec for generate_worksheet_variants
+    VARIANT_KEYS = ('output', 'sections', 'answer_space', 'section_gap', 'page_margin')
+
+    def generate_worksheet_variants(self, variants, title="Math Worksheet", progress=None,
+                                    cancel_event=None, use_xobjects=True, optimize=True,
+                                    object_streams=False, linearize=False, workers=1):
+        """
+        Render several variants of the worksheet from one plan.
+
+        Each variant is a dict with an ``output`` (a path or a writable
+        binary stream, as for ``generate_worksheet_pdf``) and optionally
+        ``sections`` (ids to include, default all of ``self.sections``),
+        ``answer_space``, ``section_gap`` and ``page_margin``::
+
+            [{'output': 'ws_2.3.pdf', 'sections': ['2.3']},
+             {'output': 'compact.pdf', 'answer_space': 60},
+             {'output': 'print.pdf', 'answer_space': 320, 'page_margin': 54}]
+
+        The source is opened and planned once, for all sections any variant
+        uses; each variant then only paginates its subset of the plan,
+        places the strips and writes, reusing the parsed source pages and
+        their decoded contents.  The remaining options apply to every
+        variant.
+
+        With ``workers`` > 1 the variants are split over that many
+        processes, each planning the source once for its share; outputs
+        must then be paths.  ``progress(done, total)`` counts finished
+        variants.  Returns the write report of every variant, in order.
+        """
+        variants = list(variants)
+        for spec in variants:
+            unknown = set(spec) - set(self.VARIANT_KEYS)
+            if unknown:
+                raise ValueError(f"Unknown variant option(s): {', '.join(sorted(unknown))}")
+            if 'output' not in spec:
+                raise ValueError("Every variant needs an 'output'")
+        options = {'title': title, 'use_xobjects': use_xobjects, 'optimize': optimize,
+                   'object_streams': object_streams, 'linearize': linearize}
+
+        workers = min(workers or os.cpu_count() or 1, len(variants))
+        if workers > 1:
+            if any(hasattr(spec['output'], 'write') for spec in variants):
+                raise ValueError("Variants rendered in parallel need file paths as outputs")
+            return self._render_variants_parallel(variants, workers, options,
+                                                  progress, cancel_event)
+
+        # Plan only what some variant needs
+        if all(spec.get('sections') is not None for spec in variants):
+            sections = self.select_sections(
+                {sid for spec in variants for sid in spec['sections']})
+            if self.sections and not sections:
+                raise Exception("Error generating PDF: no variant selects any of "
+                                "the extracted sections")
+            plan = self.plan_worksheet(sections)
+        else:
+            plan = self.plan_worksheet()
+
+        reports = []
+        for idx, spec in enumerate(variants):
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled("Render cancelled")
+            variant_plan = plan
+            if spec.get('sections') is not None:
+                variant_plan = plan.subset(spec['sections'])
+                if not variant_plan.section_ids:
+                    raise Exception(f"Error generating PDF: variant {idx + 1} selects "
+                                    f"none of the extracted sections")
+            self.generate_worksheet_pdf(spec['output'], cancel_event=cancel_event,
+                                        plan=variant_plan,
+                                        answer_space=spec.get('answer_space'),
+                                        section_gap=spec.get('section_gap'),
+                                        page_margin=spec.get('page_margin'), **options)
+            reports.append(self.last_write_report)
+            if progress is not None:
+                progress(idx + 1, len(variants))
+        return reports
+
+    def _render_variants_parallel(self, variants, workers, options, progress, cancel_event):
+        """Render ``variants`` round-robin on ``workers`` processes."""
+        groups = [variants[i::workers] for i in range(workers)]
+        state = {'pdf_path': self.pdf_path, 'sources': self.sources,
+                 'sections': self.sections, 'page_lines': self.page_lines}
+        reports = [None] * len(variants)
+        finished = 0
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=self.mp_context) as pool:
+            futures = {pool.submit(_render_variant_group, type(self), state, group, options): i
+                       for i, group in enumerate(groups)}
+            try:
+                while futures:
+                    done, _ = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise OperationCancelled("Render cancelled")
+                    for future in done:
+                        i = futures.pop(future)
+                        for j, report in enumerate(future.result()):
+                            reports[i + j * workers] = report
+                        finished += len(groups[i])
+                        if progress is not None:
+                            progress(finished, len(variants))
+            finally:
+                for future in futures:
+                    future.cancel()
+        return reports
+
+    @staticmethod
+    def _render_pages(plan, pages, page_margin, use_xobjects,
+                      progress=None, cancel_event=None, timings=None):
+        """
+        Draw paginated strips onto a new PdfWriter and return it.
+
+        Per strip, ``crop`` (wrapping or copying the source page) and
+        ``merge`` (placing it on the output page) are recorded in ``timings``.
+        """
+        from PyPDF2 import PageObject, PdfWriter
+        from PyPDF2.generic import (DecodedStreamObject, DictionaryObject,
+                                    NameObject, RectangleObject)
+
+        if timings is None:
+            timings = PhaseTimings()
+        clock = time.perf_counter
+        reader = plan.reader
+        PAGE_W = plan.page_w
+        PAGE_H = plan.page_h
+
+        writer   = PdfWriter()
+        total    = sum(len(page_strips) for page_strips in pages)
+        placed   = 0            # strips rendered so far (for progress)
+        xobjects = {}           # source page index -> (name, indirect ref)
+
+        def page_xobject(pg_idx):
+            """Wrap a source page in a Form XObject the first time it is used."""
+            if pg_idx not in xobjects:
+                original = reader.pages[pg_idx]
+                form = DecodedStreamObject()
+                form.set_data(plan.page_content(pg_idx))
+                form[NameObject('/Type')] = NameObject('/XObject')
+                form[NameObject('/Subtype')] = NameObject('/Form')
+                form[NameObject('/BBox')] = RectangleObject(original.mediabox)
+                if '/Resources' in original:
+                    form[NameObject('/Resources')] = original['/Resources'].clone(writer)
+                # PyPDF2 has no public API to register a new indirect object
+                xobjects[pg_idx] = (NameObject(f'/SrcP{pg_idx}'),
+                                    writer._add_object(form))
+            return xobjects[pg_idx]
+
+        for page_strips in pages:
+            out_page = PageObject.create_blank_page(width=PAGE_W, height=PAGE_H)
+            ops = []
+            page_xobjects = DictionaryObject()
+
+            for (strip, sh, dest_y_bot) in page_strips:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OperationCancelled("Render cancelled")
+                placed += 1
+                if progress is not None:
+                    progress(placed, total)
+                if strip is None:
+                    continue  # blank gap – nothing to draw
+
+                # Translate the strip so its bottom (pdf_lower, still in the
+                # source page's coordinates) lands at dest_y_bot.
+                pg_idx, pdf_lower, pdf_upper = strip
+                tx = page_margin   # left margin indent (same as source)
+                ty = dest_y_bot - pdf_lower
+
+                if use_xobjects:
+                    # Clip to the strip in source coordinates, then draw
+                    # the shared page XObject under the same transform.
+                    t0 = clock()
+                    name, ref = page_xobject(pg_idx)
+                    t1 = clock()
+                    page_xobjects[name] = ref
+                    ops.append(
+                        f"q 1 0 0 1 {_num(tx)} {_num(ty)} cm "
+                        f"0 {_num(pdf_lower)} {_num(PAGE_W)} {_num(pdf_upper - pdf_lower)} re W n "
+                        f"{name} Do Q"
+                    )
+                else:
+                    # merge_page clips to the strip's box, so the box is
+                    # moved along with the content.
+                    t0 = clock()
+                    cropped = copy.copy(reader.pages[pg_idx])
+                    cropped.add_transformation([1, 0, 0, 1, tx, ty])
+                    cropped.mediabox = RectangleObject(
+                        [tx, pdf_lower + ty, tx + PAGE_W, pdf_upper + ty])
+                    cropped.trimbox = cropped.mediabox
+                    t1 = clock()
+                    out_page.merge_page(cropped)
+                timings.add('crop', t1 - t0, strip=placed, page=pg_idx + 1)
+                timings.add('merge', clock() - t1, strip=placed, page=pg_idx + 1)
+
+            if ops:
+                content = DecodedStreamObject()
+                content.set_data("\n".join(ops).encode('ascii'))
+                out_page[NameObject('/Resources')] = DictionaryObject(
+                    {NameObject('/XObject'): page_xobjects})
+                out_page[NameObject('/Contents')] = writer._add_object(content)
+            writer.add_page(out_page)
+
+        return writer
+
+    # ------------------------------------------------------------------
+    def _scan_section_lines(self, sec, lines, matches, pg, page_height, boundary_y):
+        """
+        Count the questions of an open section on one page's PageLines.
+
+        ``boundary_y`` is the top of the next section's header when it sits on
+        this page; lines from there on belong to the next section.
+        ``matches`` holds ``LineMatcher.match`` of every line of the page.
+        """
+        question_pattern = sec['question_pattern']
+        bottoms, texts = lines.bottoms, lines.texts
+
+        # Lines above the running header band never count; lines from the
+        # next section's header on belong to the next section
+        start = lines.index_at(self.HEADER_MARGIN_PT)
+        stop = len(lines) if boundary_y is None else lines.index_at(boundary_y)
+        footer_y = page_height - self.FOOTER_MARGIN_PT
+
+        for i in range(start, stop):
+            # Skip the running footer band
+            if bottoms[i] > footer_y:
+                continue
+
+            # Check if this line is part of the questions; a line the
+            # combined matcher found nothing on cannot hold one
+            header, questions = matches[i]
+            if (header or questions) and question_pattern.search(texts[i]):
+                sec['question_count'] += 1
+                sec['last_question_page'] = pg
+                sec['last_question_bottom'] = bottoms[i]
+            elif sec['last_question_page'] == pg and sec['question_count'] > 0:
+                # Continuation of question text (sub-questions, etc.)
+                sec['last_question_bottom'] = bottoms[i]
+
+    @staticmethod
+    def _finish_section(sec):
+        """Turn the sweep state of a closed section into a section record."""
+        return {
+            'title': sec['title'],
+            'section_id': sec['section_id'],
+            'start_page': sec['page'],
+            'start_y': sec['y_top'],
+            'end_page': sec['last_question_page'],
+            # Add some padding below the last question
+            'end_y': sec['last_question_bottom'] + 20,
+            'question_count': sec['question_count'],
+        }
 
     # ------------------------------------------------------------------
     @staticmethod
     def _words_to_lines(words, y_tolerance=3):
-        """Group words into lines based on y-position."""
+        """Group words into lines based on y-position; returns a PageLines."""
         if not words:
-            return []
+            return PageLines([], [], [])
 
-        # Sort by vertical position, then horizontal
-        sorted_words = sorted(words, key=lambda w: (round(w['top'] / y_tolerance), w['x0']))
+        # Sort by vertical position, then horizontal.  Pulling the fields
+        # out once keeps the grouping loop free of dict lookups.
+        w_top    = [w['top'] for w in words]
+        w_bottom = [w['bottom'] for w in words]
+        w_text   = [w['text'] for w in words]
+        w_x0     = [w['x0'] for w in words]
+        order = sorted(range(len(words)),
+                       key=lambda i: (round(w_top[i] / y_tolerance), w_x0[i]))
 
-        lines = []
-        current_line = {
-            'text': sorted_words[0]['text'],
-            'top': sorted_words[0]['top'],
-            'bottom': sorted_words[0]['bottom'],
-        }
+        tops, bottoms, texts = [], [], []
+        first = order[0]
+        line_top, line_bottom, parts = w_top[first], w_bottom[first], [w_text[first]]
 
-        for word in sorted_words[1:]:
-            if abs(word['top'] - current_line['top']) <= y_tolerance:
-                current_line['text'] += ' ' + word['text']
-                current_line['bottom'] = max(current_line['bottom'], word['bottom'])
+        for i in order[1:]:
+            top = w_top[i]
+            if abs(top - line_top) <= y_tolerance:
+                parts.append(w_text[i])
+                if w_bottom[i] > line_bottom:
+                    line_bottom = w_bottom[i]
             else:
-                lines.append(current_line)
-                current_line = {
-                    'text': word['text'],
-                    'top': word['top'],
-                    'bottom': word['bottom'],
-                }
+                tops.append(line_top)
+                bottoms.append(line_bottom)
+                texts.append(' '.join(parts))
+                line_top, line_bottom, parts = top, w_bottom[i], [w_text[i]]
+
+        tops.append(line_top)
+        bottoms.append(line_bottom)
+        texts.append(' '.join(parts))
+        return PageLines(tops, bottoms, texts)
+
+
+class PageLines:
+    """
+    Text lines of one page as parallel arrays, ordered top to bottom.
+
+    ``tops`` is strictly increasing: a new line only starts on a word in a
+    later ``round(top / y_tolerance)`` bucket than the previous line's
+    first word, so y-range queries can bisect instead of scanning.
+    """
+    __slots__ = ('tops', 'bottoms', 'texts')
+
+    def __init__(self, tops, bottoms, texts):
+        self.tops = tops
+        self.bottoms = bottoms
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.tops)
+
+    def index_at(self, y):
+        """Index of the first line whose top is at or below ``y``."""
+        return bisect_left(self.tops, y)
 
-        lines.append(current_line)
-        return lines
+    def geometry(self):
+        """Compact ``[top, bottom]`` pairs, as stored in ``page_lines``."""
+        return [[t, b] for t, b in zip(self.tops, self.bottoms)]
@@ -0,0 +1,134 @@
+"""
+Optimised write path for generated worksheets.
+
+``write_pdf`` compresses uncompressed streams and folds identical objects
+(fonts, images, resource dictionaries pulled in from different source
+pages) into one before handing the document to PyPDF2's writer.  Object
+streams and linearized output are beyond PyPDF2 and use the optional
+``pikepdf`` package.
+"""
+import hashlib
+import io
+
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject,
+                            IndirectObject, NullObject)
+
+
+def compress_streams(writer):
+    """Flate-encode every stream that has no filter yet; returns the count."""
+    count = 0
+    for i, obj in enumerate(writer._objects):
+        if not isinstance(obj, DecodedStreamObject) or '/Filter' in obj:
+            continue
+        encoded = obj.flate_encode()
+        # flate_encode only carries the filter over - keep the rest of the dict
+        for key, value in obj.items():
+            if key not in ('/Filter', '/Length'):
+                encoded[key] = value
+        encoded.indirect_reference = obj.indirect_reference
+        writer._objects[i] = encoded
+        count += 1
+    return count
+
+
+def dedupe_objects(writer):
+    """
+    Replace byte-identical streams and dictionaries by a single copy.
+
+    References to a duplicate are rewritten to the surviving object and the
+    duplicate's slot becomes ``null``.  Runs until nothing changes, so
+    objects that only become identical once their children were merged
+    (two font dicts pointing at two copies of one font file) fold too.
+    Page objects and the document skeleton are never merged.
+    """
+    protected = {ref.idnum for ref in (writer._root, writer._pages, writer._info)
+                 if ref is not None}
+    merged = 0
+
+    while True:
+        seen = {}
+        remap = {}
+        for i, obj in enumerate(writer._objects):
+            idnum = i + 1
+            if idnum in protected or not isinstance(obj, DictionaryObject):
+                continue
+            if obj.get('/Type') in ('/Page', '/Pages', '/Catalog'):
+                continue
+            buf = io.BytesIO()
+            obj.write_to_stream(buf, None)
+            key = (type(obj), hashlib.sha256(buf.getvalue()).digest())
+            if key in seen:
+                remap[idnum] = seen[key]
+            else:
+                seen[key] = idnum
+
+        if not remap:
+            return merged
+
+        for idnum in remap:
+            writer._objects[idnum - 1] = NullObject()
+        for obj in writer._objects:
+            _rewrite_refs(obj, remap, writer)
+        merged += len(remap)
+
+
+def _rewrite_refs(obj, remap, writer):
+    """Point direct children of ``obj`` that reference a duplicate at its survivor."""
+    if isinstance(obj, DictionaryObject):
+        items = obj.items()
+    elif isinstance(obj, ArrayObject):
+        items = enumerate(obj)
+    else:
+        return
+
+    for key, value in list(items):
+        if isinstance(value, IndirectObject):
+            if value.pdf is writer and value.idnum in remap:
+                obj[key] = IndirectObject(remap[value.idnum], 0, writer)
+        else:
+            _rewrite_refs(value, remap, writer)
+
+
+def write_pdf(writer, stream, optimize=True, object_streams=False, linearize=False):
+    """
+    Write ``writer`` to a binary ``stream``; returns a small report dict.
+
+    ``optimize`` compresses and de-duplicates objects first.
+    ``object_streams`` and ``linearize`` post-process the file with pikepdf.
+    Streams without a position (pipes, sockets) get the finished file in
+    one write, since the cross-reference table needs byte offsets.
+    """
+    try:
+        stream.tell()
+    except (AttributeError, OSError):
+        buf = io.BytesIO()
+        report = write_pdf(writer, buf, optimize, object_streams, linearize)
+        stream.write(buf.getbuffer())
+        return report
+
+    report = {'streams_compressed': 0, 'objects_deduplicated': 0}
+    if optimize:
+        report['streams_compressed'] = compress_streams(writer)
+        report['objects_deduplicated'] = dedupe_objects(writer)
+
+    start = stream.tell()
+    if object_streams or linearize:
+        try:
+            import pikepdf
+        except ImportError:
+            raise Exception("Object streams and linearized output need the "
+                            "optional 'pikepdf' package (pip install pikepdf).")
+        buf = io.BytesIO()
+        writer.write(buf)
+        buf.seek(0)
+        with pikepdf.open(buf) as pdf:
+            pdf.save(stream,
+                     object_stream_mode=(pikepdf.ObjectStreamMode.generate if object_streams
+                                         else pikepdf.ObjectStreamMode.preserve),
+                     compress_streams=optimize,
+                     linearize=linearize)
+    else:
+        writer.write(stream)
+
+    report['bytes'] = stream.tell() - start
+    return report
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+
+class ContentCache:
+    """
+    A directory of cache entries keyed by source content and settings.
+
+    The common part of SectionCache and WorksheetCache: the SHA-256 of
+    source files (memoised on path, size and modification time), entry
+    names built from those hashes, ``FORMAT_VERSION`` and the caller's
+    settings, atomic writes, and least-recently-used eviction once the
+    directory grows past ``max_bytes`` (or holds more than ``max_entries``
+    entries).  Subclasses decide what an entry holds and set
+    ``ENTRY_SUFFIX``; files next to an entry with the same name and one of
+    ``COMPANION_SUFFIXES`` count towards its size and go with it.
+    """
+
+    FORMAT_VERSION = 1
+    ENTRY_SUFFIX = None
+    COMPANION_SUFFIXES = ()
+    HASH_MEMO_SIZE = 256  # content hashes remembered, least recently used dropped
+
+    def __init__(self, cache_dir, max_bytes, max_entries=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._hash_memo = OrderedDict()  # (path, size, mtime_ns) -> content hash
+
+    def clear(self):
+        """Delete every cached entry."""
+        for name, _, _ in self._entries():
+            self._remove(os.path.join(self.cache_dir, name))
+
+    def content_hash(self, pdf_path):
+        """SHA-256 of the file's bytes, memoised on (path, size, mtime)."""
+        st = os.stat(pdf_path)
+        memo_key = (os.path.abspath(pdf_path), st.st_size, st.st_mtime_ns)
+        digest = self._hash_memo.get(memo_key)
+        if digest is not None:
+            self._hash_memo.move_to_end(memo_key)
+            return digest
+
+        h = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._hash_memo[memo_key] = digest
+        if len(self._hash_memo) > self.HASH_MEMO_SIZE:
+            self._hash_memo.popitem(last=False)
+        return digest
+
+    # ------------------------------------------------------------------
+    def _entry_path(self, hashes, settings):
+        """Path of the entry for sources with these content ``hashes``."""
+        key = hashlib.sha256()
+        for digest in hashes:
+            key.update(digest.encode('ascii'))
+        key.update(json.dumps([self.FORMAT_VERSION, settings],
+                              sort_keys=True).encode('utf-8'))
+        return os.path.join(self.cache_dir, key.hexdigest() + self.ENTRY_SUFFIX)
+
+    def _write_atomic(self, path, data):
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _touch(entry_path):
+        # Bump the entry so LRU eviction keeps recently used ones
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """List ``(name, size, mtime)`` for every entry, companions included in size."""
+        entries = []
+        try:
+            names = set(os.listdir(self.cache_dir))
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(self.ENTRY_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            size = st.st_size
+            stem = name[:-len(self.ENTRY_SUFFIX)]
+            for companion in (stem + suffix for suffix in self.COMPANION_SUFFIXES):
+                if companion in names:
+                    try:
+                        size += os.stat(os.path.join(self.cache_dir, companion)).st_size
+                    except OSError:
+                        pass
+            entries.append((name, size, st.st_mtime))
+        return entries
+
+    def _remove(self, entry_path):
+        os.remove(entry_path)
+        stem = entry_path[:-len(self.ENTRY_SUFFIX)]
+        for suffix in self.COMPANION_SUFFIXES:
+            try:
+                os.remove(stem + suffix)
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Drop the oldest entries until the cache is within budget; returns how many."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        max_entries = self.max_entries if self.max_entries is not None else count
+
+        # Oldest first
+        evicted = 0
+        for name, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes and count <= max_entries:
+                break
+            try:
+                self._remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+            count -= 1
+            evicted += 1
+        return evicted
+
+
+class SectionCache(ContentCache):
+    """
+    On-disk cache of section scans, keyed by PDF content and detection settings.
+
+    Each entry is a small JSON file holding the ``sections`` list and the
+    per-page line geometry of one scan.  The key is the SHA-256 of the PDF's
+    bytes combined with the detection settings, so an edited file (or a
+    changed regex / tolerance / margin) simply misses and gets re-scanned.
+    Entries are evicted least-recently-used first once the directory grows
+    past ``max_bytes``.
+    """
+
+    FORMAT_VERSION = 2
+    ENTRY_SUFFIX = '.json'
+    # Every cached section record must have these (see PDFGenerator._finish_section)
+    SECTION_KEYS = ('title', 'section_id', 'start_page', 'start_y',
+                    'end_page', 'end_y', 'question_count')
+
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'worksheet-generator', 'sections')
+        super().__init__(cache_dir, max_bytes)
+
+    # ------------------------------------------------------------------
+    def load(self, pdf_path, settings):
+        """
+        Return ``(sections, page_lines)`` for a cached scan, or None.
+
+        An entry that is not a valid scan (truncated, hand-edited, or from
+        an incompatible writer) is a miss and is removed.
+        """
+        entry_path = self._entry_path([self.content_hash(pdf_path)], settings)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            entry = None
+
+        if not self._is_scan(entry):
+            try:
+                self._remove(entry_path)
+            except OSError:
+                pass
+            return None
+
+        self._touch(entry_path)
+        return entry['sections'], entry['page_lines']
+
+    def store(self, pdf_path, settings, sections, page_lines):
+        """Write a scan to the cache and evict old entries if over budget."""
+        entry_path = self._entry_path([self.content_hash(pdf_path)], settings)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = json.dumps({'sections': sections, 'page_lines': page_lines},
+                          separators=(',', ':')).encode('utf-8')
+        try:
+            self._write_atomic(entry_path, data)
+        except OSError:
+            return
+
+        self._evict()
+
+    # ------------------------------------------------------------------
+    def _is_scan(self, entry):
+        """True if a decoded entry holds a complete scan."""
+        if not isinstance(entry, dict):
+            return False
+        sections, page_lines = entry.get('sections'), entry.get('page_lines')
+        if not isinstance(sections, list) or not isinstance(page_lines, list):
+            return False
+        return all(isinstance(sec, dict) and all(key in sec for key in self.SECTION_KEYS)
+                   for sec in sections)
@@ -0,0 +1,414 @@
+"""
+Local worksheet service: upload a PDF over HTTP, get the worksheet back.
+
+    python3 src/service.py --port 8080 --workers 2 --queue 8 --timeout 120
+
+``POST /worksheet`` takes the course-notes PDF as the request body (raw
+``application/pdf`` or the first file of a ``multipart/form-data`` form)
+and answers with the worksheet PDF.  Query parameters: ``sections``
+(comma-separated ids, e.g. ``2.3,4.1``), ``formats`` (comma-separated
+heading styles, e.g. ``section,exercises``), ``title``, ``answer_space``,
+``section_gap`` and ``page_margin`` (points).  ``GET /health`` reports
+the queue state (and the worksheet cache counters) as JSON.
+
+Scans and renders run on a pool of ``--workers`` processes.  At most
+``--queue`` further jobs wait for a worker; beyond that requests are
+turned away with 503 instead of piling up.  Every job has a deadline of
+``--timeout`` seconds counted from its arrival: the worker gives up at
+its next page or strip once it passes (504).  A worker that is still
+busy a few seconds later (stuck inside one page parse or the final
+write) is killed and the pool replaced, so stuck jobs cannot hold queue
+slots for good; other jobs that were running on that pool are retried
+on the new one while they have time left.  With ``--output-cache-dir``
+finished worksheets are kept on disk, keyed by the upload's content and
+the options; a repeated request is answered from there without taking a
+queue slot or touching a worker.  Only the standard library
+is used on top of the generator, so this module never imports Qt.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from detection import resolve_profiles
+from pdf_generator import OperationCancelled, PDFGenerator
+from section_cache import SectionCache
+from worksheet_cache import WorksheetCache
+
+
+class _Deadline:
+    """Stands in for a cancel event: "set" once the wall-clock deadline passes."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def is_set(self):
+        return time.time() >= self.deadline
+
+
+def render_job(pdf_path, options, deadline, cache_dir=None, low_memory=False,
+               text_backend=None):
+    """
+    Process-pool worker: build the worksheet of one uploaded PDF.
+
+    Returns the PDF bytes, or None when the document has no (selected)
+    sections.  Raises ``OperationCancelled`` once ``deadline`` (a
+    ``time.time()`` value) has passed.
+    """
+    cancel_event = _Deadline(deadline)
+    cache = SectionCache(cache_dir) if cache_dir else None
+    with PDFGenerator(cache=cache, low_memory=low_memory,
+                      profiles=options.get('formats'),
+                      text_backend=text_backend) as generator:
+        generator.extract_questions_from_pdf(pdf_path, cancel_event=cancel_event,
+                                             section_ids=options.get('sections'))
+        if not generator.sections:
+            return None
+        return generator.generate_worksheet_bytes(
+            cancel_event=cancel_event,
+            title=options.get('title', "Math Worksheet"),
+            answer_space=options.get('answer_space'),
+            section_gap=options.get('section_gap'),
+            page_margin=options.get('page_margin'))
+
+
+def parse_options(query):
+    """Render options from a request's query string; raises ValueError."""
+    params = parse_qs(query)
+    options = {}
+    if 'sections' in params:
+        options['sections'] = [sid.strip() for value in params['sections']
+                               for sid in value.split(',') if sid.strip()]
+    if 'formats' in params:
+        options['formats'] = [name.strip() for value in params['formats']
+                              for name in value.split(',') if name.strip()]
+        resolve_profiles(options['formats'])  # unknown names -> ValueError
+    if 'title' in params:
+        options['title'] = params['title'][-1]
+    for name in ('answer_space', 'section_gap', 'page_margin'):
+        if name in params:
+            value = float(params[name][-1])
+            if not 0 <= value <= 2000:
+                raise ValueError(f"{name} out of range")
+            options[name] = value
+    return options
+
+
+def extract_upload(content_type, body):
+    """The uploaded PDF bytes from a raw or multipart request body, or None."""
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+        for part in message.iter_parts():
+            if part.get_filename() is not None:
+                return part.get_payload(decode=True)
+        return None
+    return body
+
+
+class QueueFull(Exception):
+    """Raised when every worker is busy and the waiting queue is full."""
+
+
+class WorksheetService:
+    """The worker pool and bounded job queue behind the HTTP handler."""
+
+    GRACE_S = 5  # after the deadline, how long a worker may take to notice it
+
+    def __init__(self, workers=None, queue_size=8, timeout=120.0,
+                 cache_dir=None, low_memory=False, text_backend=None,
+                 output_cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.low_memory = low_memory
+        self.text_backend = text_backend
+        self.output_cache = output_cache  # Optional WorksheetCache, used by this process only
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        # One slot per running or waiting job
+        self._slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self.capacity = self.workers + queue_size
+        self._lock = threading.Lock()
+        self.stats = {'active': 0, 'done': 0, 'rejected': 0, 'timed_out': 0, 'failed': 0,
+                      'recycled': 0}
+
+    def submit(self, pdf_bytes, options):
+        """
+        Run one job; returns the worksheet bytes (None: no sections).
+
+        Raises ``QueueFull`` when no slot is free, ``TimeoutError`` when the
+        job misses its deadline.  Other errors propagate as ``Exception``.
+        A worksheet found in ``output_cache`` is returned straight away.
+        """
+        if self.output_cache is not None:
+            settings = self._worksheet_settings(options)
+            worksheet = self.output_cache.load([pdf_bytes], settings)
+            if worksheet is not None:
+                return worksheet
+
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise QueueFull()
+        deadline = time.time() + self.timeout
+
+        # The upload is handed to the worker as a file, removed once the job ends
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        with self._lock:
+            self.stats['active'] += 1
+
+        # The slot is only freed once no worker runs the job any more
+        try:
+            worksheet = self._run(pdf_path, options, deadline)
+        except (TimeoutError, OperationCancelled):
+            self._count('timed_out')
+            raise TimeoutError()
+        except Exception:
+            self._count('failed')
+            raise
+        finally:
+            self._finish(pdf_path)
+
+        if worksheet is not None and self.output_cache is not None:
+            self.output_cache.store([pdf_bytes], settings, worksheet)
+        return worksheet
+
+    def _run(self, pdf_path, options, deadline):
+        """Run ``render_job`` on the pool; a job that ignores its deadline is killed."""
+        for attempt in range(2):
+            pool, future = self._submit(render_job, pdf_path, options, deadline,
+                                        self.cache_dir, self.low_memory, self.text_backend)
+            try:
+                # A little grace so the worker can notice the deadline itself
+                return future.result(timeout=max(0, deadline - time.time()) + self.GRACE_S)
+            except TimeoutError:
+                # Stuck inside one page or the write: stop it the hard way
+                self._recycle(pool)
+                raise
+            except BrokenProcessPool:
+                # The pool went down under the job (another job was killed, or a
+                # worker died); run it once more if there is time left
+                if attempt or time.time() >= deadline:
+                    raise
+        raise AssertionError("unreachable")
+
+    def _worksheet_settings(self, options):
+        """The WorksheetCache settings of a job (no PDF is opened)."""
+        generator = PDFGenerator(profiles=options.get('formats'),
+                                 text_backend=self.text_backend)
+        return generator.worksheet_settings(
+            options.get('sections'), options.get('answer_space'),
+            options.get('section_gap'), options.get('page_margin'))
+
+    def _submit(self, fn, *args):
+        """Submit to the current pool; returns ``(pool, future)``."""
+        with self._lock:
+            try:
+                return self.pool, self.pool.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory): start a fresh pool
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                return self.pool, self.pool.submit(fn, *args)
+
+    def _recycle(self, pool):
+        """Replace ``pool`` with a fresh one and kill its workers."""
+        with self._lock:
+            if self.pool is pool:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                self.stats['recycled'] += 1
+        # ProcessPoolExecutor has no public API to stop a busy worker
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, pdf_path):
+        with self._lock:
+            self.stats['active'] -= 1
+            self.stats['done'] += 1
+        self._slots.release()
+        try:
+            os.remove(pdf_path)
+        except OSError:
+            pass
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def health(self):
+        with self._lock:
+            health = dict(self.stats, workers=self.workers, capacity=self.capacity,
+                          timeout_s=self.timeout)
+        if self.output_cache is not None:
+            health['output_cache'] = self.output_cache.stats()
+        return health
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class WorksheetRequestHandler(BaseHTTPRequestHandler):
+    server_version = "WorksheetService/1.0"
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._send_json(HTTPStatus.OK, self.server.service.health())
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/worksheet':
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': "not found"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {'error': "Content-Length required"})
+            return
+        if length > self.server.max_upload_bytes:
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            {'error': f"upload larger than {self.server.max_upload_bytes} bytes"})
+            self.close_connection = True
+            return
+
+        try:
+            options = parse_options(url.query)
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+            return
+
+        self.connection.settimeout(self.server.read_timeout)
+        try:
+            body = self.rfile.read(length)
+        except OSError:
+            self.close_connection = True
+            return
+        pdf_bytes = extract_upload(self.headers.get('Content-Type', ''), body)
+        if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': "request body is not a PDF"})
+            return
+
+        try:
+            worksheet = self.server.service.submit(pdf_bytes, options)
+        except QueueFull:
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'error': "server busy"},
+                            {'Retry-After': '5'})
+            return
+        except TimeoutError:
+            self._send_json(HTTPStatus.GATEWAY_TIMEOUT,
+                            {'error': f"not finished within {self.server.service.timeout:g} s"})
+            return
+        except Exception as e:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)})
+            return
+
+        if worksheet is None:
+            self._send_json(HTTPStatus.UNPROCESSABLE_ENTITY,
+                            {'error': "no problem sections found"})
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(worksheet)))
+        self.send_header('Content-Disposition', 'attachment; filename="worksheet.pdf"')
+        self.end_headers()
+        self.wfile.write(worksheet)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class WorksheetServer(ThreadingHTTPServer):
+    """HTTP front end; one thread per connection waits on the worker pool."""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, max_upload_bytes=100 * 1024 * 1024,
+                 read_timeout=30.0, quiet=False):
+        super().__init__(address, WorksheetRequestHandler)
+        self.service = service
+        self.max_upload_bytes = max_upload_bytes
+        self.read_timeout = read_timeout
+        self.quiet = quiet
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Serve worksheet generation over HTTP (POST /worksheet).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--queue', type=int, default=8,
+                        help="jobs allowed to wait for a worker before answering 503")
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help="seconds a job may take, including its wait (504 after)")
+    parser.add_argument('--max-upload-mb', type=float, default=100)
+    parser.add_argument('--cache-dir', default=None,
+                        help="section cache directory (default: no cache)")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="keep scan memory flat on very long PDFs")
+    parser.add_argument('--text-backend', default=None,
+                        choices=sorted(PDFGenerator.TEXT_BACKENDS),
+                        help="where line text and positions come from (default: pdfplumber)")
+    parser.add_argument('--output-cache-dir', default=None,
+                        help="finished worksheet cache directory (default: no cache)")
+    parser.add_argument('--output-cache-mb', type=float,
+                        default=WorksheetCache.MAX_BYTES / (1024 * 1024),
+                        help="size limit of the worksheet cache (default: %(default)g)")
+    parser.add_argument('--output-cache-entries', type=int, default=None,
+                        help="most worksheets kept in the cache (default: no limit)")
+    parser.add_argument('--quiet', action='store_true', help="do not log requests")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_cache = None
+    if args.output_cache_dir:
+        output_cache = WorksheetCache(args.output_cache_dir,
+                                      int(args.output_cache_mb * 1024 * 1024),
+                                      args.output_cache_entries)
+    service = WorksheetService(args.workers, args.queue, args.timeout,
+                               args.cache_dir, args.low_memory, args.text_backend,
+                               output_cache)
+    server = WorksheetServer((args.host, args.port), service,
+                             int(args.max_upload_mb * 1024 * 1024), quiet=args.quiet)
+    print(f"Serving worksheets on http://{args.host}:{server.server_port}/worksheet "
+          f"({service.workers} workers, {args.queue} queued)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+One input PDF, read once and shared by the text and the page layer.
+
+``SourceDocument`` memory-maps the file (or reads it into memory when it
+cannot be mapped) and serves both libraries from those bytes:
+``plumber`` (pdfplumber, used to find sections) and ``reader`` (PyPDF2,
+used by the prefilter and to crop pages).  Each gets its own read cursor
+over the shared buffer, and each is parsed once, on first use, so a
+worksheet generated right after a scan reuses the xref and object tree
+the scan already built.  The libraries themselves are imported on first
+use as well.
+
+The handle must be closed (or used as a context manager) to release the
+mapping; parsers and plans built from it are unusable afterwards.
+
+``DocumentSet`` puts several inputs behind one running page index for
+combined worksheets, mapping one document at a time.
+"""
+import io
+import mmap
+import os
+from bisect import bisect_right
+
+
+class _MappedStream(io.RawIOBase):
+    """Independent binary read cursor over a shared buffer (no copy)."""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size=-1):
+        start = min(self._pos, len(self._view))
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._pos = end
+        return self._view[start:end].tobytes()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class SourceDocument:
+    """A memory-mapped input PDF with lazily created pdfplumber / PyPDF2 parsers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        st = os.fstat(self._file.fileno())
+        self._signature = (st.st_size, st.st_mtime_ns)
+        try:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and some file systems cannot be mapped
+            self._buffer = self._file.read()
+        self._streams = []
+        self._plumber = None
+        self._reader = None
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    @property
+    def plumber(self):
+        """The pdfplumber document, opened on first use."""
+        if self._plumber is None:
+            import pdfplumber
+            self._plumber = pdfplumber.open(self.stream())
+        return self._plumber
+
+    @property
+    def reader(self):
+        """The PyPDF2 reader, parsed on first use."""
+        if self._reader is None:
+            from PyPDF2 import PdfReader
+            self._reader = PdfReader(self.stream())
+        return self._reader
+
+    def stream(self):
+        """A new binary stream over the document's bytes with its own position."""
+        if self.closed:
+            raise ValueError(f"{self.path} is closed")
+        stream = _MappedStream(self._buffer)
+        self._streams.append(stream)
+        return stream
+
+    def is_current(self, path):
+        """True if this handle still shows ``path`` as it is on disk."""
+        if self.closed or os.path.abspath(path) != os.path.abspath(self.path):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == self._signature
+
+    def close(self):
+        """Drop both parsers and release the mapping."""
+        if self.closed:
+            return
+        self._plumber = None
+        self._reader = None
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DocumentSet:
+    """
+    Several source PDFs behind one running page index (combined worksheets).
+
+    Page ``i`` of the set is page ``i - offsets[k]`` of document ``k``.
+    ``pages[i]`` returns that PyPDF2 page, mapping its document on demand;
+    with ``one_at_a_time`` the previously open document is closed first,
+    so walking the pages in order keeps a single source open.
+    """
+
+    def __init__(self, paths, page_counts, one_at_a_time=True):
+        self.paths = list(paths)
+        self.offsets = [0]
+        for n in page_counts:
+            self.offsets.append(self.offsets[-1] + n)
+        self.one_at_a_time = one_at_a_time
+        self._open = {}  # document index -> SourceDocument
+
+    @property
+    def pages(self):
+        return self
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, index):
+        doc_idx, page_idx = self.locate(index)
+        return self.document(doc_idx).reader.pages[page_idx]
+
+    def locate(self, index):
+        """``(document index, page index in that document)`` of a set page."""
+        if not 0 <= index < len(self):
+            raise IndexError(f"page {index} out of range")
+        doc_idx = bisect_right(self.offsets, index) - 1
+        return doc_idx, index - self.offsets[doc_idx]
+
+    def document(self, doc_idx):
+        """The SourceDocument of input ``doc_idx``, mapped if needed."""
+        if doc_idx not in self._open:
+            if self.one_at_a_time:
+                self.close()
+            self._open[doc_idx] = SourceDocument(self.paths[doc_idx])
+        return self._open[doc_idx]
+
+    def close(self):
+        """Close every mapped document; they are reopened on the next access."""
+        for document in self._open.values():
+            document.close()
+        self._open.clear()
@@ -0,0 +1,333 @@
+"""
+Watch folders and rebuild worksheets whenever course-notes PDFs change.
+
+    python3 src/watcher.py shared/notes/ -o shared/worksheets/ -j 2 --settle 5
+
+Every ``--interval`` seconds the folders are listed (``-r`` recursively)
+and each PDF's size and modification time are compared with the last
+poll.  A file is only picked up once it has kept the same size and time
+for ``--settle`` seconds and ends with a PDF trailer, so copies that are
+still being written are left alone.  Its SHA-256 is then compared with
+the one its worksheet was last built from: a touched or re-copied but
+identical file is skipped, as is any file that failed with the same
+content before.
+
+Changed files are built by ``cli.process_pdf`` on a pool of ``-j``
+processes, with at most ``--queue`` further files handed to the pool;
+the rest of a burst simply waits for a later poll.  What was built from
+which content is kept in ``.watch-state.json`` in the output directory,
+so a restarted watcher only rebuilds what changed while it was down.
+The worksheets themselves are never taken as inputs, so the output
+directory may be (or lie inside) a watched folder.
+Polling needs nothing beyond the standard library and works the same on
+network shares, where change notifications are unreliable.  ``--once``
+processes the current contents and exits.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cli import collect_inputs, process_pdf
+from detection import BUILTIN_PROFILES
+from pdf_generator import PDFGenerator
+from section_cache import SectionCache
+
+
+class FolderWatcher:
+    """
+    Polls folders for new or changed PDFs and rebuilds their worksheets.
+
+    Call ``poll()`` periodically (``run()`` does so every ``interval``
+    seconds); ``process_options`` are passed to ``cli.process_pdf`` for
+    every file.  ``on_result(result)`` receives each finished
+    ``process_pdf`` result, extended with ``hash``.
+    """
+
+    STATE_FILE = '.watch-state.json'
+    TRAILER_BYTES = 1024  # how much of a file's end is searched for %%EOF
+
+    def __init__(self, folders, output_dir, recursive=False, interval=2.0, settle=5.0,
+                 jobs=None, queue=None, process_options=None, on_result=None):
+        self.folders = list(folders)
+        self.output_dir = output_dir
+        self.recursive = recursive
+        self.interval = interval
+        self.settle = settle
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.capacity = self.jobs + (self.jobs if queue is None else max(0, queue))
+        self.process_options = dict(process_options or {})
+        self.on_result = on_result
+        self.stats = {'built': 0, 'unchanged': 0, 'failed': 0, 'deferred': 0}
+
+        self._hasher = SectionCache()  # only for its memoised content_hash
+        self._seen = {}  # path -> [(size, mtime_ns), first seen at, handled]
+        self._running = {}  # path -> (future, content hash, output path)
+        self._pool = None
+        self._state_path = os.path.join(output_dir, self.STATE_FILE)
+        self._state = self._load_state()  # path -> {hash, output, status}
+
+    # ------------------------------------------------------------------
+    def poll(self, now=None):
+        """Collect finished builds, then submit every settled, changed PDF."""
+        now = time.monotonic() if now is None else now
+        self._reap()
+
+        present = set()
+        outputs = self._outputs()
+        for path in collect_inputs(self.folders, self.recursive):
+            path = os.path.abspath(path)
+            if path in outputs or self._in_output_dir(path):
+                continue
+            present.add(path)
+            if path in self._running:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+
+            entry = self._seen.get(path)
+            if entry is None or entry[0] != signature:
+                # New or still changing: (re)start its settle time
+                self._seen[path] = [signature, now, False]
+                if self.settle > 0:
+                    continue
+                entry = self._seen[path]
+            if entry[2] or now - entry[1] < self.settle:
+                continue
+            if not self._looks_complete(path, st.st_size):
+                # Stable but truncated: wait for the next change to it
+                entry[2] = True
+                continue
+
+            if len(self._running) >= self.capacity:
+                self.stats['deferred'] += 1
+                continue
+            entry[2] = self._submit_if_changed(path)
+
+        # Forget deleted files; their worksheets are left in place
+        for path in list(self._seen):
+            if path not in present:
+                del self._seen[path]
+
+    def pending(self):
+        """Number of files being built or waiting to settle."""
+        waiting = sum(1 for _, _, handled in self._seen.values() if not handled)
+        return len(self._running) + waiting
+
+    def run(self, stop_event=None, once=False):
+        """
+        Poll until ``stop_event`` is set (or, with ``once``, until every
+        file present at the start has been handled).
+        """
+        try:
+            while stop_event is None or not stop_event.is_set():
+                self.poll()
+                if once and not self.pending():
+                    break
+                if stop_event is not None:
+                    stop_event.wait(self.interval)
+                else:
+                    time.sleep(self.interval)
+        finally:
+            self.close()
+
+    def close(self):
+        """Wait for running builds, record them and stop the pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._reap()
+            self._pool = None
+
+    # ------------------------------------------------------------------
+    def _submit_if_changed(self, path):
+        """Start a build unless the content is what the last build saw; True if handled."""
+        try:
+            digest = self._hasher.content_hash(path)
+        except OSError:
+            return False
+        record = self._state.get(path)
+        if record is not None and record['hash'] == digest and (
+                record['status'] != 'ok' or os.path.exists(record['output'])):
+            self.stats['unchanged'] += 1
+            return True
+
+        output = record['output'] if record else self._new_output(path)
+        if self._pool is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+        try:
+            future = self._pool.submit(process_pdf, path, output, **self.process_options)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): start a fresh pool
+            self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+            future = self._pool.submit(process_pdf, path, output, **self.process_options)
+        self._running[path] = (future, digest, output)
+        return True
+
+    def _reap(self):
+        changed = False
+        for path, (future, digest, output) in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[path]
+            if future.cancelled():
+                # Dropped at shutdown: built on the next start
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                result = {'input': path, 'output': None, 'status': 'failed',
+                          'sections': [], 'timings': {}, 'error': str(e)}
+            result['hash'] = digest
+            self.stats['failed' if result['status'] == 'failed' else 'built'] += 1
+            self._state[path] = {'hash': digest, 'output': output,
+                                 'status': result['status']}
+            changed = True
+            if self.on_result is not None:
+                self.on_result(result)
+        if changed:
+            self._save_state()
+
+    def _outputs(self):
+        """Every worksheet this watcher has written or is writing."""
+        outputs = {os.path.abspath(record['output']) for record in self._state.values()}
+        outputs.update(os.path.abspath(output) for _, _, output in self._running.values())
+        return outputs
+
+    def _in_output_dir(self, path):
+        """True for files under an output directory that is not itself watched."""
+        output_dir = os.path.abspath(self.output_dir)
+        if any(os.path.abspath(folder) == output_dir for folder in self.folders):
+            return False
+        return os.path.commonpath([path, output_dir]) == output_dir
+
+    def _looks_complete(self, path, size):
+        """True if the file ends with a PDF trailer (``%%EOF``)."""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(max(0, size - self.TRAILER_BYTES))
+                return b'%%EOF' in f.read()
+        except OSError:
+            return False
+
+    def _new_output(self, path):
+        """``<output_dir>/<name>_worksheet.pdf``, numbered if another input uses it."""
+        used = {record['output'] for record in self._state.values()}
+        used.update(output for _, _, output in self._running.values())
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.join(self.output_dir, f"{stem}_worksheet.pdf")
+        n = 2
+        while output in used:
+            output = os.path.join(self.output_dir, f"{stem}_worksheet_{n}.pdf")
+            n += 1
+        return output
+
+    def _load_state(self):
+        try:
+            with open(self._state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, indent=1)
+            os.replace(tmp_path, self._state_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Rebuild worksheets whenever PDFs in the watched folders change.")
+    parser.add_argument('folders', nargs='+', help="folders to watch for PDFs")
+    parser.add_argument('-o', '--output-dir', required=True,
+                        help="directory that receives the worksheets")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="watch subfolders too")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--queue', type=int, default=None,
+                        help="changed files handed to the pool beyond those running "
+                             "(default: one per worker)")
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help="seconds between polls (default: 2)")
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help="seconds a file must stay unchanged before it is built "
+                             "(default: 5)")
+    parser.add_argument('--once', action='store_true',
+                        help="build what is there now and exit")
+    parser.add_argument('--sections', metavar='ID', nargs='+', default=None,
+                        help="only include these sections")
+    parser.add_argument('--formats', metavar='NAME', nargs='+', default=None,
+                        choices=sorted(BUILTIN_PROFILES),
+                        help="heading styles to detect (default: section)")
+    parser.add_argument('--text-backend', default=None,
+                        choices=sorted(PDFGenerator.TEXT_BACKENDS),
+                        help="where line text and positions come from (default: pdfplumber)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="section cache directory "
+                             "(default: ~/.cache/worksheet-generator/sections)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always re-scan the input PDFs")
+    parser.add_argument('--output-cache-dir', default=None,
+                        help="reuse finished worksheets kept in this directory")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="keep scan memory flat on very long PDFs")
+    return parser
+
+
+def log_result(result):
+    """One line per finished build on stderr."""
+    if result['status'] == 'ok':
+        took = sum(result['timings'].get(k, 0) for k in ('extract_s', 'generate_s'))
+        detail = (f"{len(result['sections'])} sections, {took:.1f}s"
+                  + (", cached" if result.get('cached') else ""))
+        print(f"{result['input']} -> {result['output']} ({detail})", file=sys.stderr)
+    elif result['status'] == 'no_sections':
+        print(f"{result['input']}: no problem sections found", file=sys.stderr)
+    else:
+        print(f"{result['input']}: failed: {result['error']}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = {
+        'cache_dir': args.cache_dir,
+        'use_cache': not args.no_cache,
+        'low_memory': args.low_memory,
+        'section_ids': args.sections,
+        'formats': args.formats,
+        'text_backend': args.text_backend,
+        'output_cache_dir': args.output_cache_dir,
+    }
+    watcher = FolderWatcher(args.folders, args.output_dir, args.recursive,
+                            args.interval, args.settle, args.jobs, args.queue,
+                            options, on_result=log_result)
+    if not args.once:
+        print(f"Watching {', '.join(args.folders)} every {args.interval:g}s "
+              f"({watcher.jobs} workers)", file=sys.stderr)
+    stop = threading.Event()
+    try:
+        watcher.run(stop, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(watcher.stats), file=sys.stderr)
+    return 1 if watcher.stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from section_cache import ContentCache
+
+
+class WorksheetCache(ContentCache):
+    """
+    On-disk cache of finished worksheet PDFs, keyed by content and settings.
+
+    The key combines the SHA-256 of every source PDF (in order, for combined
+    worksheets) with ``PDFGenerator.worksheet_settings()``: the selected
+    sections, spacing and margin constants, write options, detection
+    settings and ``PDFGenerator.OUTPUT_VERSION``.  A hit is the stored PDF
+    as written, so serving it needs no PDF parsing or rendering at all.
+
+    Each entry is ``<key>.pdf`` plus an optional ``<key>.json`` holding
+    caller metadata (e.g. the section summary of the CLI).  Entries are
+    evicted least-recently-used first once the directory grows past
+    ``max_bytes`` or holds more than ``max_entries`` worksheets.  ``hits``,
+    ``misses``, ``stores`` and ``evictions`` count this object's lookups
+    (thread-safe) and are reported by ``stats()``.
+    """
+
+    FORMAT_VERSION = 1
+    ENTRY_SUFFIX = '.pdf'
+    COMPANION_SUFFIXES = ('.json',)  # the metadata
+    MAX_BYTES = 256 * 1024 * 1024  # default size limit
+
+    def __init__(self, cache_dir=None, max_bytes=None, max_entries=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'worksheet-generator', 'worksheets')
+        super().__init__(cache_dir, self.MAX_BYTES if max_bytes is None else max_bytes,
+                         max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def load(self, sources, settings):
+        """
+        Return the cached worksheet as ``bytes``, or None.
+
+        ``sources`` lists the source PDFs, each as a path or as its bytes.
+        """
+        entry_path = self._worksheet_path(sources, settings)
+        try:
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self._count('misses')
+            return None
+        self._hit(entry_path)
+        return data
+
+    def copy_to(self, sources, settings, output):
+        """
+        Copy a cached worksheet to ``output`` (a path or a writable binary
+        stream); returns False on a miss, leaving ``output`` untouched.
+        Errors writing ``output`` are raised, not treated as a miss.
+        """
+        entry_path = self._worksheet_path(sources, settings)
+        try:
+            entry = open(entry_path, 'rb')
+        except OSError:
+            self._count('misses')
+            return False
+        with entry:
+            if hasattr(output, 'write'):
+                shutil.copyfileobj(entry, output)
+            else:
+                with open(output, 'wb') as f:
+                    shutil.copyfileobj(entry, f)
+        self._hit(entry_path)
+        return True
+
+    def load_meta(self, sources, settings):
+        """The metadata stored with a worksheet, or None."""
+        meta_path = self._meta_path(self._worksheet_path(sources, settings))
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, sources, settings, data, meta=None):
+        """Cache the worksheet ``data`` (bytes) and evict old entries if over budget."""
+        entry_path = self._worksheet_path(sources, settings)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # The metadata goes first so a visible PDF always has its metadata
+        try:
+            if meta is not None:
+                self._write_atomic(self._meta_path(entry_path),
+                                   json.dumps(meta, separators=(',', ':')).encode('utf-8'))
+            self._write_atomic(entry_path, data)
+        except OSError:
+            return
+
+        self._count('stores')
+        evicted = self._evict()
+        if evicted:
+            self._count('evictions', evicted)
+
+    def stats(self):
+        """Lookup counters of this object plus the current size of the cache."""
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+            }
+
+    # ------------------------------------------------------------------
+    def source_hash(self, source):
+        """SHA-256 of a source given as a path or as its ``bytes``."""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(source).hexdigest()
+        return self.content_hash(source)
+
+    def _worksheet_path(self, sources, settings):
+        return self._entry_path([self.source_hash(source) for source in sources], settings)
+
+    @staticmethod
+    def _meta_path(entry_path):
+        return os.path.splitext(entry_path)[0] + '.json'
+
+    def _hit(self, entry_path):
+        self._touch(entry_path)
+        self._count('hits')
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
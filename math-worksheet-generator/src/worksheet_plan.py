@@ -0,0 +1,201 @@
+from bisect import bisect_right
+import copy
+
+
+class WorksheetPlan:
+    """
+    Reusable layout plan for a worksheet.
+
+    Built once from the extracted sections and the source page sizes, the
+    plan holds every question region ("strip") that will be cropped from the
+    source PDF.  Spacing and margins are only applied in ``paginate``, so a
+    worksheet can be re-laid-out and re-rendered with different
+    ``ANSWER_SPACE_PT`` / ``SECTION_GAP_PT`` / ``PAGE_MARGIN_PT`` values
+    without re-reading or re-cropping the source.
+
+    A strip is ``(source page index, pdf_lower, pdf_upper)`` in PDF
+    (bottom-up) coordinates of its source page; blank gaps are ``None``.
+
+    ``page_lines`` is the per-page ``[top, bottom]`` line geometry recorded
+    during extraction; pagination uses it to split strips that are taller
+    than a page between two lines.
+
+    ``subset`` derives a plan of fewer sections that shares the source, the
+    strips and the decoded page contents, so several variants of one
+    worksheet are planned once.
+    """
+
+    def __init__(self, reader, sections, header_margin, footer_margin, page_lines=None):
+        self.reader = reader  # kept open so renders reuse the parsed source
+        self.page_lines = page_lines or []
+        self.page_heights = {}  # source page index -> height
+        self._line_index = {}   # source page index -> (tops, bottoms)
+        self._contents = {}     # source page index -> decoded content stream bytes
+        self.section_ids = [sec['section_id'] for sec in sections]
+
+        # Derive page dimensions from the first source page
+        ref_page    = reader.pages[sections[0]['start_page']]
+        self.page_w = float(ref_page.mediabox.width)   # e.g. 612 pt (letter)
+        self.page_h = float(ref_page.mediabox.height)  # e.g. 792 pt (letter)
+
+        # One list of (strip, strip_height_pt) per section
+        self.section_strips = []
+
+        for sec in sections:
+            strips = []
+            for pg_idx in range(sec['start_page'], sec['end_page'] + 1):
+                page_height = float(reader.pages[pg_idx].mediabox.height)
+                self.page_heights[pg_idx] = page_height
+
+                # --- crop bounds in pdfplumber (top-down) coords ---
+                if pg_idx == sec['start_page']:
+                    crop_top = max(sec['start_y'] - 10, 0)
+                else:
+                    crop_top = header_margin   # skip running header
+
+                if pg_idx == sec['end_page']:
+                    crop_bot = min(sec['end_y'], page_height)
+                else:
+                    crop_bot = page_height - footer_margin   # skip running footer
+
+                strip_h = crop_bot - crop_top
+                if strip_h <= 0:
+                    continue
+
+                # Convert to PDF (bottom-up) coordinates
+                pdf_lower = page_height - crop_bot
+                pdf_upper = page_height - crop_top
+                strips.append(((pg_idx, pdf_lower, pdf_upper), strip_h))
+            self.section_strips.append(strips)
+
+    def subset(self, section_ids):
+        """A plan of only the sections whose id is in ``section_ids`` (same order)."""
+        wanted = set(section_ids)
+        keep = [i for i, sid in enumerate(self.section_ids) if sid in wanted]
+        sub = copy.copy(self)  # shares reader, page sizes and content caches
+        sub.section_ids = [self.section_ids[i] for i in keep]
+        sub.section_strips = [self.section_strips[i] for i in keep]
+        return sub
+
+    def page_content(self, pg_idx):
+        """The decoded content stream of a source page, read once per plan."""
+        if pg_idx not in self._contents:
+            contents = self.reader.pages[pg_idx].get_contents()
+            self._contents[pg_idx] = contents.get_data() if contents is not None else b''
+        return self._contents[pg_idx]
+
+    def strips(self, answer_space, section_gap):
+        """The whole "scroll": question strips separated by blank gaps."""
+        strips = []
+        for sec_idx, sec_strips in enumerate(self.section_strips):
+            strips.extend(sec_strips)
+
+            # After every section add an answer-space marker (None = blank gap)
+            strips.append((None, answer_space))
+
+            # Extra visual gap between sections (except after the last one)
+            if sec_idx < len(self.section_strips) - 1:
+                strips.append((None, section_gap))
+        return strips
+
+    def paginate(self, answer_space, section_gap, page_margin):
+        """
+        Slice the scroll into output pages.
+
+        Strategy: walk through strips top-to-bottom.  Each strip is either a
+        region of a source page or a blank gap.  Accumulate content onto the
+        current output page; when a strip would overflow, emit the current
+        page and start a new one.  A strip taller than a whole page is split
+        between two text lines: the first piece fills the current page and
+        the rest continues on the next, so nothing is clipped.
+
+        Returns a list of pages, each a list of ``(strip, height, dest_y_bot)``.
+        """
+        usable_h = self.page_h - 2 * page_margin
+        cursor_y = usable_h   # remaining space on current output page
+        y_bottom = self.page_h - page_margin  # current top-of-page in PDF coords (from bottom)
+
+        pages = []
+        page_strips = []
+
+        def place(strip, sh):
+            nonlocal y_bottom, cursor_y
+            dest_y_bot = y_bottom - sh
+            page_strips.append((strip, sh, dest_y_bot))
+            y_bottom -= sh
+            cursor_y -= sh
+
+        def new_page():
+            nonlocal y_bottom, cursor_y, page_strips
+            pages.append(page_strips)
+            cursor_y    = usable_h
+            y_bottom    = self.page_h - page_margin
+            page_strips = []
+
+        for (strip, sh) in self.strips(answer_space, section_gap):
+            if strip is None and sh > usable_h:
+                # A blank gap never needs more than one page
+                sh = usable_h
+
+            while strip is not None and sh > usable_h:
+                # Fill the current page up to the last line boundary that fits
+                head, tail = self._split_strip(strip, cursor_y)
+                if head is None:
+                    if page_strips:
+                        new_page()
+                        continue
+                    # Not even a fresh page holds one line: cut at the page edge
+                    head, tail = self._split_strip(strip, usable_h, at_lines=False)
+                place(*head)
+                new_page()
+                strip, sh = tail
+
+            if sh > cursor_y:
+                new_page()
+            place(strip, sh)
+
+        # The last (possibly partial) page
+        if page_strips:
+            pages.append(page_strips)
+        return pages
+
+    def _split_strip(self, strip, avail, at_lines=True):
+        """
+        Split ``strip`` so that its first piece is at most ``avail`` tall.
+
+        With ``at_lines`` the cut goes between the last line that fits and
+        the next one (using the extraction line geometry); returns
+        ``(None, None)`` when no line boundary fits.  Otherwise the strip is
+        cut exactly at ``avail``.  Pieces are ``(strip, height)`` pairs.
+        """
+        pg_idx, pdf_lower, pdf_upper = strip
+        page_height = self.page_heights[pg_idx]
+        top = page_height - pdf_upper   # top-down coordinates, like page_lines
+        bot = page_height - pdf_lower
+
+        if at_lines:
+            tops, bottoms = self._lines(pg_idx)
+            # Last line that starts inside the space available
+            idx = bisect_right(tops, top + avail) - 1
+            if idx < 0 or tops[idx] <= top:
+                return None, None
+            cut = tops[idx]
+            if idx > 0 and bottoms[idx - 1] < cut:
+                cut = (bottoms[idx - 1] + cut) / 2   # middle of the gap between lines
+            if cut <= top:
+                return None, None
+        else:
+            cut = top + avail
+
+        head = ((pg_idx, page_height - cut, pdf_upper), cut - top)
+        tail = ((pg_idx, pdf_lower, page_height - cut), bot - cut)
+        return head, tail
+
+    def _lines(self, pg_idx):
+        """Sorted line tops and bottoms of a source page (empty if unknown)."""
+        if pg_idx not in self._line_index:
+            geometry = (self.page_lines[pg_idx]
+                        if pg_idx < len(self.page_lines) else None) or []
+            self._line_index[pg_idx] = ([g[0] for g in geometry],
+                                        [g[1] for g in geometry])
+        return self._line_index[pg_idx]